@@ -1,12 +1,17 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
+import functools
 import logging
 import os
+import threading
+import weakref
 from collections.abc import AsyncIterator
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Final, Optional
 
-from google.adk.agents.llm_agent import Agent, LlmAgent
+from google.adk.agents.llm_agent import LlmAgent
 from google.adk.errors.already_exists_error import AlreadyExistsError
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
@@ -51,51 +56,56 @@ settings = get_settings()
 if "GOOGLE_API_KEY" not in os.environ:
     os.environ["GOOGLE_API_KEY"] = settings.google_api_key
 
-# This agent is used to test with agent development kit web interface
-root_agent = Agent(
-    model=settings.google_agent_model,
-    name="root_agent",
-    description=AGENT_DESCRIPTION,
-    instruction=AGENT_INSTRUCTION,
-    tools=[
-        get_current_time,
-        capture_simit_screenshot,
-        tomtom_route_with_traffic,
-        tomtom_find_nearby_services,
-        tomtom_geocode_address,
-        tomtom_find_nearby_services_by_address,
-    ],
-)
-
 #### MAIN AGENT CODE ####
 
 APP_NAME = "agents"
 USER_ID = "1234"
 SESSION_ID = "session1234"
 
-session_service = InMemorySessionService()
+session_service: Final = InMemorySessionService()
+
+
+# Each Telegram user gets a session of their own, so conversation histories never
+# mix; turns without a telegram_id (ADK testing) share the default session.
+# Turns of the same session run one at a time (see ``invoke_agent``), tracked with
+# one lock per session that lives only while some turn holds or awaits it.
+_session_locks: weakref.WeakValueDictionary[tuple[str, str], asyncio.Lock] = (
+    weakref.WeakValueDictionary()
+)
+_created_sessions: set[tuple[str, str]] = set()
+
+
+def _session_key(telegram_id: int | None) -> tuple[str, str]:
+    """Return the ``(user_id, session_id)`` of the ADK session for a user."""
+
+    if telegram_id is None:
+        return USER_ID, SESSION_ID
+    return f"telegram-{telegram_id}", f"telegram-{telegram_id}"
 
 
-async def _ensure_session() -> None:
+async def _ensure_session(user_id: str, session_id: str) -> None:
+    if (user_id, session_id) in _created_sessions:
+        return
     try:
         await session_service.create_session(
             app_name=APP_NAME,
-            user_id=USER_ID,
-            session_id=SESSION_ID,
+            user_id=user_id,
+            session_id=session_id,
         )
         logger.info(
             "Created session %s for app %s and user %s",
-            SESSION_ID,
+            session_id,
             APP_NAME,
-            USER_ID,
+            user_id,
         )
     except AlreadyExistsError:
         logger.debug(
             "Session %s for app %s and user %s already exists",
-            SESSION_ID,
+            session_id,
             APP_NAME,
-            USER_ID,
+            user_id,
         )
+    _created_sessions.add((user_id, session_id))
 
 # Base agent for ADK testing (simple tools without database logging)
 agent = LlmAgent(
@@ -104,6 +114,7 @@ agent = LlmAgent(
     description=AGENT_DESCRIPTION,
     instruction=AGENT_INSTRUCTION,
     tools=[
+        get_current_time,
         capture_simit_screenshot,
         tomtom_route_with_traffic,
         tomtom_find_nearby_services,
@@ -112,6 +123,10 @@ agent = LlmAgent(
     ],
 )
 
+# Entry point discovered by the agent development kit web interface; it is the
+# same base agent, not a second copy.
+root_agent = agent
+
 # Separate agent for Telegram with database logging tools
 telegram_agent = LlmAgent(
     model=settings.google_agent_model,
@@ -119,6 +134,7 @@ telegram_agent = LlmAgent(
     description=AGENT_DESCRIPTION,
     instruction=AGENT_INSTRUCTION,
     tools=[
+        get_current_time,
         telegram_capture_simit_screenshot,
         telegram_tomtom_route_with_traffic,
         telegram_tomtom_find_nearby_services,
@@ -127,8 +143,33 @@ telegram_agent = LlmAgent(
     ],
 )
 
-runner = Runner(agent=agent, app_name=APP_NAME, session_service=session_service)
-telegram_runner = Runner(agent=telegram_agent, app_name=APP_NAME, session_service=session_service)
+# Built once at import time and shared by every request; use ``get_runner``.
+runner: Final = Runner(agent=agent, app_name=APP_NAME, session_service=session_service)
+telegram_runner: Final = Runner(
+    agent=telegram_agent, app_name=APP_NAME, session_service=session_service
+)
+
+
+# Dedicated, bounded pool for the blocking per-turn agent loop so agent turns do not
+# compete with (or exhaust) the default executor used by ``asyncio.to_thread``.
+_AGENT_EXECUTOR: Final = ThreadPoolExecutor(
+    max_workers=settings.agent_max_workers, thread_name_prefix="agent"
+)
+
+
+# Bounded hand-off between the agent worker and the consumer: a slow consumer
+# blocks the worker instead of letting chunks pile up in memory. A slow consumer
+# is normal (Telegram flood waits can hold a send for minutes), so the worker
+# waits as long as it takes and only gives up once the consumer is gone; it
+# checks for that every ``_EMIT_POLL_SECONDS``.
+_MESSAGE_QUEUE_SIZE: Final = 32
+_EMIT_POLL_SECONDS: Final = 1.0
+
+
+def get_runner(use_telegram_tools: bool = False) -> Runner:
+    """Return the process-wide runner for the requested toolset."""
+
+    return telegram_runner if use_telegram_tools else runner
 
 
 def _run_agent_sync(
@@ -136,62 +177,149 @@ def _run_agent_sync(
     *,
     loop: asyncio.AbstractEventLoop,
     queue: asyncio.Queue[Optional[str]],
+    consumer_closed: threading.Event,
+    user_id: str,
+    session_id: str,
     telegram_id: int | None = None,
     use_telegram_tools: bool = False,
 ) -> None:
-    # Set user context for Telegram tools if telegram_id is provided
-    if use_telegram_tools and telegram_id:
+    # ``Runner.run`` would drive ``run_async`` on a bare thread of its own, which
+    # does not inherit context variables; run the turn's event loop on this thread.
+    asyncio.run(
+        _run_agent(
+            query,
+            loop=loop,
+            queue=queue,
+            consumer_closed=consumer_closed,
+            user_id=user_id,
+            session_id=session_id,
+            telegram_id=telegram_id,
+            use_telegram_tools=use_telegram_tools,
+        )
+    )
+
+
+async def _run_agent(
+    query: str,
+    *,
+    loop: asyncio.AbstractEventLoop,
+    queue: asyncio.Queue[Optional[str]],
+    consumer_closed: threading.Event,
+    user_id: str,
+    session_id: str,
+    telegram_id: int | None = None,
+    use_telegram_tools: bool = False,
+) -> None:
+    # The turn runs in its own copy of the context, so this never leaks into the
+    # next turn handled by the same worker thread.
+    if use_telegram_tools:
         set_user_context(telegram_id)
 
     content = types.Content(role="user", parts=[types.Part(text=query)])
-    active_runner = telegram_runner if use_telegram_tools else runner
-    events = active_runner.run(
-        user_id=USER_ID,
-        session_id=SESSION_ID,
+    events = get_runner(use_telegram_tools).run_async(
+        user_id=user_id,
+        session_id=session_id,
         new_message=content,
     )
 
     final_answer: Optional[str] = None
 
-    def _emit(message: str) -> None:
+    async def _emit(message: Optional[str]) -> None:
+        # Waits while the queue is full, which is the backpressure signal, for as
+        # long as the consumer is still there.
+        if consumer_closed.is_set():
+            raise RuntimeError("Agent response consumer is gone; aborting run")
         future = asyncio.run_coroutine_threadsafe(queue.put(message), loop)
-        future.result()
+        put = asyncio.wrap_future(future)
+        while True:
+            done, _ = await asyncio.wait({put}, timeout=_EMIT_POLL_SECONDS)
+            if done:
+                put.result()
+                return
+            if consumer_closed.is_set() or loop.is_closed() or not loop.is_running():
+                future.cancel()
+                raise RuntimeError("Agent response consumer is gone; aborting run")
 
     try:
-        previous_message: Optional[str] = None
-
-        for event in events:
-            event_content = getattr(event, "content", None)
-            if event_content is None:
-                continue
-
-            parts = getattr(event_content, "parts", [])
-            text_segments: list[str] = []
-
-            for part in parts:
-                part_text = getattr(part, "text", None)
-                if isinstance(part_text, str):
-                    normalized_text = part_text.strip()
-                    if normalized_text:
-                        text_segments.append(normalized_text)
+        # (length, hash) of the last message: a cheap way to skip exact repeats.
+        previous_key: Optional[tuple[int, int]] = None
+        previous_message = ""
+
+        async with contextlib.aclosing(events):
+            async for event in events:
+                # ADK events and genai parts expose these as real (optional) attributes.
+                content = event.content
+                if content is None:
+                    continue
+
+                text_segments = [
+                    stripped
+                    for part in content.parts or ()
+                    if part.text and (stripped := part.text.strip())
+                ]
+                if not text_segments:
+                    continue
+
+                message_text = "\n\n".join(text_segments)
+
+                message_key = (len(message_text), hash(message_text))
+                if previous_key != message_key:
+                    if previous_message and message_text.startswith(previous_message):
+                        # Cumulative update of the previous message: only send what is
+                        # new, with its leading whitespace so it joins the text so far.
+                        # A whitespace-only suffix is held back (not recorded as sent)
+                        # and goes out with the next one.
+                        delta = message_text[len(previous_message) :]
+                        if delta.strip():
+                            await _emit(delta)
+                            previous_key = message_key
+                            previous_message = message_text
+                    else:
+                        # A new message starts after a blank line, so the chunks of
+                        # the stream can simply be concatenated.
+                        await _emit(
+                            f"\n\n{message_text}" if previous_message else message_text
+                        )
+                        previous_key = message_key
+                        previous_message = message_text
+
+                if event.is_final_response():
+                    final_answer = message_text
 
-            if not text_segments:
-                continue
+        if final_answer is None:
+            raise RuntimeError("Agent did not return a final response")
 
-            message_text = "\n\n".join(text_segments)
+    finally:
+        if not consumer_closed.is_set():
+            try:
+                await _emit(None)
+            except RuntimeError:
+                logger.warning("Could not deliver end-of-stream marker; the consumer is gone")
 
-            if previous_message != message_text:
-                _emit(message_text)
-                previous_message = message_text
 
-            if event.is_final_response():
-                final_answer = message_text
+async def _next_message(
+    queue: asyncio.Queue[Optional[str]], worker_future: asyncio.Future[None]
+) -> Optional[str]:
+    """Return the next queued message, or ``None`` once the stream has ended.
 
-        if final_answer is None:
-            raise RuntimeError("Agent did not return a final response")
+    The worker's end-of-stream marker is not delivered when ``_emit`` gave up on
+    a consumer that went away, so the worker finishing also ends the stream
+    (after whatever it had already queued).
+    """
 
+    if not queue.empty():
+        return queue.get_nowait()
+    if worker_future.done():
+        return None
+    get_task = asyncio.ensure_future(queue.get())
+    try:
+        await asyncio.wait({get_task, worker_future}, return_when=asyncio.FIRST_COMPLETED)
     finally:
-        asyncio.run_coroutine_threadsafe(queue.put(None), loop).result()
+        if not get_task.done():
+            get_task.cancel()
+    if get_task.done() and not get_task.cancelled():
+        return get_task.result()
+    return queue.get_nowait() if not queue.empty() else None
 
 
 async def invoke_agent(
@@ -205,28 +333,58 @@ async def invoke_agent(
         use_telegram_tools: If True, use tools with database logging. Default False for ADK testing.
 
     Returns:
-        Async iterator of response text chunks.
+        Async iterator of response text chunks whose concatenation is the whole
+        reply. Each chunk is either a new message (the first one as is, later
+        ones prefixed with a blank line) or — when ADK re-sends a message that
+        extends the previous one — only the appended part, leading whitespace
+        included.
     """
-    await _ensure_session()
-
-    loop = asyncio.get_running_loop()
-    message_queue: asyncio.Queue[Optional[str]] = asyncio.Queue()
-    worker_task = asyncio.create_task(
-        asyncio.to_thread(
-            _run_agent_sync,
-            query,
-            loop=loop,
-            queue=message_queue,
-            telegram_id=telegram_id,
-            use_telegram_tools=use_telegram_tools,
+    user_id, session_id = _session_key(telegram_id)
+    lock = _session_locks.get((user_id, session_id))
+    if lock is None:
+        lock = _session_locks[(user_id, session_id)] = asyncio.Lock()
+
+    # A user's quick successive messages would otherwise run as concurrent turns
+    # appending to the same session history.
+    async with lock:
+        await _ensure_session(user_id, session_id)
+
+        loop = asyncio.get_running_loop()
+        consumer_closed = threading.Event()
+        message_queue: asyncio.Queue[Optional[str]] = asyncio.Queue(maxsize=_MESSAGE_QUEUE_SIZE)
+        worker_future = loop.run_in_executor(
+            _AGENT_EXECUTOR,
+            functools.partial(
+                _run_agent_sync,
+                query,
+                loop=loop,
+                queue=message_queue,
+                consumer_closed=consumer_closed,
+                user_id=user_id,
+                session_id=session_id,
+                telegram_id=telegram_id,
+                use_telegram_tools=use_telegram_tools,
+            ),
         )
-    )
 
-    try:
-        while True:
-            item = await message_queue.get()
-            if item is None:
-                break
-            yield item
-    finally:
-        await worker_task
\ No newline at end of file
+        finished = False
+        try:
+            while True:
+                item = await _next_message(message_queue, worker_future)
+                if item is None:
+                    finished = True
+                    break
+                yield item
+        finally:
+            if not finished:
+                # The consumer stopped early: tell the worker to stop emitting and
+                # drain so a put already waiting on the full queue completes.
+                consumer_closed.set()
+                while await _next_message(message_queue, worker_future) is not None:
+                    pass
+                try:
+                    await worker_future
+                except RuntimeError:
+                    logger.debug("Agent run aborted after its consumer stopped early")
+            else:
+                await worker_future
@@ -4,13 +4,15 @@ These prompts describe the agent's role assisting with Colombian mobility
 topics (including TransMilenio) and how it should guide the conversation.
 """
 
-AGENT_DESCRIPTION = (
+from typing import Final
+
+AGENT_DESCRIPTION: Final[str] = (
     "Asiste a las personas con información sobre movilidad en Colombia,"
     " incluidas rutas y servicios de TransMilenio, horarios y trámites"
     " relacionados."
 )
 
-AGENT_INSTRUCTION = (
+AGENT_INSTRUCTION: Final[str] = (
     "Eres un asistente de movilidad colombiano cercano, empático y muy"
     " conversacional. Acompañas a las personas mientras planean recorridos"
     " en TransMilenio, resuelven dudas de transporte público y gestionan"
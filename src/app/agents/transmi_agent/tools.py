@@ -4,7 +4,11 @@
 from __future__ import annotations
 
 import logging
+import unicodedata
+from datetime import datetime
+from functools import lru_cache
 from typing import Any
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 from app.services.simit import capture_simit_screenshot_service
 from app.services.tomtom import (
@@ -16,22 +20,119 @@ from app.services.tomtom import (
 
 logger = logging.getLogger(__name__)
 
+_COLOMBIA_TZ = "America/Bogota"
+
+# Normalized city name (lowercase, no accents) -> IANA timezone.
+_CITY_TIMEZONES: dict[str, str] = {
+    **dict.fromkeys(
+        (
+            "colombia",
+            "bogota",
+            "medellin",
+            "cali",
+            "barranquilla",
+            "cartagena",
+            "bucaramanga",
+            "cucuta",
+            "pereira",
+            "manizales",
+            "armenia",
+            "ibague",
+            "santa marta",
+            "villavicencio",
+            "pasto",
+            "neiva",
+            "monteria",
+            "tunja",
+            "popayan",
+            "valledupar",
+            "sincelejo",
+            "soacha",
+        ),
+        _COLOMBIA_TZ,
+    ),
+    "ciudad de mexico": "America/Mexico_City",
+    "mexico city": "America/Mexico_City",
+    "lima": "America/Lima",
+    "quito": "America/Guayaquil",
+    "caracas": "America/Caracas",
+    "panama": "America/Panama",
+    "santiago": "America/Santiago",
+    "buenos aires": "America/Argentina/Buenos_Aires",
+    "sao paulo": "America/Sao_Paulo",
+    "miami": "America/New_York",
+    "nueva york": "America/New_York",
+    "new york": "America/New_York",
+    "los angeles": "America/Los_Angeles",
+    "madrid": "Europe/Madrid",
+    "londres": "Europe/London",
+    "london": "Europe/London",
+    "paris": "Europe/Paris",
+}
+
+
+def _normalize_city(city: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", city.strip().lower())
+    without_accents = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(without_accents.split())
+
+
+@lru_cache(maxsize=256)
+def _zone_for_city(city: str) -> str | None:
+    # The time itself cannot be cached, but the city -> zone resolution can: the
+    # model asks about the same few cities over and over.
+    return _CITY_TIMEZONES.get(_normalize_city(city))
+
 
 async def get_current_time(city: str) -> dict[str, str]:
-    """Mock tool that returns the current time in a specified city."""
+    """Return the current local time (24h, ``HH:MM``) in the given city.
+
+    Works for Colombian cities and a few international capitals. An unknown city
+    returns ``status="error"`` so the user can be asked for a nearby major city.
+    """
 
-    return {"status": "success", "city": city, "time": "10:30 AM", "climate": "sunny"}
+    zone_name = _zone_for_city(city or "")
+    if zone_name is None:
+        return {
+            "status": "error",
+            "error_type": "not_found",
+            "message": f"No conozco la zona horaria de '{city}'.",
+        }
+
+    try:
+        zone = ZoneInfo(zone_name)
+    except ZoneInfoNotFoundError:
+        logger.exception("Timezone database is missing %s", zone_name)
+        return {
+            "status": "error",
+            "error_type": "configuration",
+            "message": "La base de datos de zonas horarias no está disponible en el servidor.",
+        }
+
+    now = datetime.now(zone)
+    return {
+        "status": "success",
+        "city": city,
+        "timezone": zone_name,
+        "time": now.strftime("%H:%M"),
+        "date": now.date().isoformat(),
+    }
 
 
 async def capture_simit_screenshot(plate: str) -> dict[str, Any]:
-    """Tool wrapper that delegates to the Simit service layer.
+    """Capture the Simit account status page for a vehicle plate.
+
+    The screenshot is saved on the server and referenced by ``file_path`` (the
+    image itself is not returned). ``container_text`` holds the text shown on the
+    account status page and is what should be used to answer the user.
 
     Keeping this thin wrapper makes it easy to reuse the same core logic from
     other parts of the application while presenting a simple tool interface.
     """
 
     # The service already applies the required error-handling strategy.
-    return await capture_simit_screenshot_service(plate=plate)
+    # The model answers from ``container_text``, so the tool always asks for it.
+    return await capture_simit_screenshot_service(plate=plate, extract_text=True)
 
 
 async def tomtom_route_with_traffic(
@@ -10,9 +10,8 @@ This module follows the Single Responsibility Principle:
 
 from __future__ import annotations
 
-import asyncio
 import logging
-import threading
+from contextvars import ContextVar
 from typing import Any
 
 from app.agents.transmi_agent.tools import (
@@ -32,27 +31,29 @@ from app.agents.transmi_agent.tools import (
 )
 from app.db.crud import (
     log_address_search_by_telegram_id,
+    log_address_searches_by_telegram_id,
     log_plate_by_telegram_id,
 )
 
 logger = logging.getLogger(__name__)
 
-# Thread-local storage to pass telegram_id from handler to tools
+# Context variable to pass telegram_id from handler to tools
 # This avoids polluting tool signatures while allowing logging
-_context = threading.local()
+_TELEGRAM_ID: ContextVar[int | None] = ContextVar("telegram_id", default=None)
 
 
 def set_user_context(telegram_id: int | None) -> None:
-    """Set the current user's telegram_id in thread-local context.
+    """Set the current user's telegram_id in the current context.
 
-    This should be called from the Telegram handler before invoking the agent.
+    This should be called from the agent turn before the tools run; tasks
+    started afterwards inherit the value.
     """
-    _context.telegram_id = telegram_id
+    _TELEGRAM_ID.set(telegram_id)
 
 
 def get_user_context() -> int | None:
-    """Get the current user's telegram_id from thread-local context."""
-    return getattr(_context, "telegram_id", None)
+    """Get the current user's telegram_id from the current context."""
+    return _TELEGRAM_ID.get()
 
 
 async def capture_simit_screenshot(plate: str) -> dict[str, Any]:
@@ -65,11 +66,11 @@ async def capture_simit_screenshot(plate: str) -> dict[str, Any]:
     result = await _base_capture_simit_screenshot(plate=plate)
 
     # Log plate usage if we have telegram_id in context.
-    telegram_id = get_user_context()
+    telegram_id = _TELEGRAM_ID.get()
     if telegram_id and result.get("status") == "success":
         try:
-            # Run sync DB operation in thread to avoid blocking event loop
-            await asyncio.to_thread(log_plate_by_telegram_id, telegram_id, plate)
+            # The service already normalized the plate; log that form.
+            log_plate_by_telegram_id(telegram_id, result["plate"])
         except Exception:  # noqa: BLE001
             logger.exception("Failed to log plate lookup by telegram_id")
 
@@ -89,15 +90,12 @@ async def tomtom_route_with_traffic(
     result = await _base_tomtom_route_with_traffic(origin=origin, destination=destination)
 
     # Log both origin and destination addresses when available.
-    telegram_id = get_user_context()
+    telegram_id = _TELEGRAM_ID.get()
     if telegram_id and result.get("status") == "success":
         try:
-            # Run sync DB operations in thread to avoid blocking event loop
-            await asyncio.to_thread(
-                log_address_search_by_telegram_id, telegram_id, origin, "route_origin"
-            )
-            await asyncio.to_thread(
-                log_address_search_by_telegram_id, telegram_id, destination, "route_destination"
+            log_address_searches_by_telegram_id(
+                telegram_id,
+                [(origin, "route_origin"), (destination, "route_destination")],
             )
         except Exception:  # noqa: BLE001
             logger.exception("Failed to log route addresses by telegram_id")
@@ -124,13 +122,10 @@ async def tomtom_find_nearby_services(
         radius_meters=radius_meters,
     )
 
-    telegram_id = get_user_context()
+    telegram_id = _TELEGRAM_ID.get()
     if telegram_id and result.get("status") == "success":
         try:
-            # Run sync DB operation in thread to avoid blocking event loop
-            await asyncio.to_thread(
-                log_address_search_by_telegram_id, telegram_id, f"nearby:{query}", "nearby_services"
-            )
+            log_address_search_by_telegram_id(telegram_id, f"nearby:{query}", "nearby_services")
         except Exception:  # noqa: BLE001
             logger.exception("Failed to log nearby services query by telegram_id")
 
@@ -146,13 +141,10 @@ async def tomtom_geocode_address(address: str) -> dict[str, Any]:
 
     result = await _base_tomtom_geocode_address(address=address)
 
-    telegram_id = get_user_context()
+    telegram_id = _TELEGRAM_ID.get()
     if telegram_id and result.get("status") == "success":
         try:
-            # Run sync DB operation in thread to avoid blocking event loop
-            await asyncio.to_thread(
-                log_address_search_by_telegram_id, telegram_id, address, "geocode"
-            )
+            log_address_search_by_telegram_id(telegram_id, address, "geocode")
         except Exception:  # noqa: BLE001
             logger.exception("Failed to log geocode query by telegram_id")
 
@@ -176,13 +168,10 @@ async def tomtom_find_nearby_services_by_address(
         radius_meters=radius_meters,
     )
 
-    telegram_id = get_user_context()
+    telegram_id = _TELEGRAM_ID.get()
     if telegram_id and result.get("status") == "success":
         try:
-            # Run sync DB operation in thread to avoid blocking event loop
-            await asyncio.to_thread(
-                log_address_search_by_telegram_id, telegram_id, address, "nearby_by_address"
-            )
+            log_address_search_by_telegram_id(telegram_id, address, "nearby_by_address")
         except Exception:  # noqa: BLE001
             logger.exception("Failed to log nearby-by-address query by telegram_id")
 
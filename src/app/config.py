@@ -9,13 +9,25 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 _DEFAULT_ALLOWED_UPDATES: tuple[str, ...] = ("message", "callback_query")
 
 
+@lru_cache(maxsize=8)
+def _parse_allowed_updates_text(raw: str) -> tuple[str, ...]:
+    cleaned = tuple(item for item in (part.strip() for part in raw.split(",")) if item)
+    return cleaned or _DEFAULT_ALLOWED_UPDATES
+
+
 def _normalize_allowed_updates(raw: object) -> tuple[str, ...]:
     if raw is None or raw == "":
         return _DEFAULT_ALLOWED_UPDATES
 
+    # Already normalized (e.g. the default): nothing to rebuild.
+    if isinstance(raw, tuple) and all(
+        isinstance(item, str) and item and item == item.strip() for item in raw
+    ):
+        return raw or _DEFAULT_ALLOWED_UPDATES
+
     if isinstance(raw, str):
-        candidates = [item.strip() for item in raw.split(",")]
-    elif isinstance(raw, Iterable) and not isinstance(raw, dict):
+        return _parse_allowed_updates_text(raw)
+    if isinstance(raw, Iterable) and not isinstance(raw, dict):
         candidates = [str(item).strip() for item in raw]
     else:
         raise ValueError(
@@ -59,6 +71,9 @@ class Settings(BaseSettings):
         default=None, alias="TELEGRAM_WEBHOOK_URL"
     )
     telegram_webhook_path: str = Field(default="/telegram/webhook")
+    telegram_concurrent_updates: int = Field(
+        default=64, ge=1, alias="TELEGRAM_CONCURRENT_UPDATES"
+    )
 
     telegram_allowed_updates: tuple[str, ...] = Field(
         default=_DEFAULT_ALLOWED_UPDATES,
@@ -68,6 +83,7 @@ class Settings(BaseSettings):
     google_api_key: str = Field(..., alias="GOOGLE_API_KEY")
     google_agent_model: str = Field(default="gemini-2.5-flash", alias="GOOGLE_AGENT_MODEL")
     google_agent_name: str = Field(default="transmibot-agent", alias="GOOGLE_AGENT_NAME")
+    agent_max_workers: int = Field(default=8, ge=1, alias="AGENT_MAX_WORKERS")
 
     tomtom_api_key: str = Field(..., alias="TOMTOM_API_KEY")
 
@@ -1,38 +1,58 @@
 from __future__ import annotations
 
+import functools
+import logging
+from collections.abc import Iterable
+from datetime import datetime
 from typing import Callable
 
-from sqlalchemy import select
+from cachetools import TTLCache
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
-from app.db.models import AddressSearch, Interaction, Plate, User
+from app.db.models import User
 from app.db.session import SessionLocal
+from app.db.user_cache import remember_user_id
+from app.db.writer import LogEvent, log_writer
+from app.services._loop import on_service_loop
+
+logger = logging.getLogger(__name__)
+
+# Active users send many messages with an unchanged profile. Their last upserted
+# row is reused for a while, so repeat messages skip the database; as a result
+# ``last_seen_at`` is refreshed at most once per TTL for a steady user. Only
+# touched on the service loop, so it needs no lock.
+_RECENT_USERS_TTL_SECONDS = 600.0
+_RECENT_USERS_MAX = 10_000
+
+_recent_users: TTLCache[int, User] = TTLCache(
+    maxsize=_RECENT_USERS_MAX, ttl=_RECENT_USERS_TTL_SECONDS
+)
 
 
 def _with_session(fn: Callable):
-    """Simple decorator to manage DB session lifecycle and error handling."""
-
-    def wrapper(*args, **kwargs):
-        from logging import getLogger
-
-        logger = getLogger(__name__)
-        session = SessionLocal()
-        try:
-            result = fn(session, *args, **kwargs)
-            session.commit()
-            return result
-        except Exception:  # noqa: BLE001
-            session.rollback()
-            logger.exception("Database operation failed")
-            return None
-        finally:
-            session.close()
+    """Simple decorator to manage DB session lifecycle and error handling.
+
+    The wrapped coroutine always runs on the service loop, the only loop the
+    async engine's pooled connections may be used from.
+    """
+
+    @on_service_loop
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        async with SessionLocal() as session:
+            try:
+                result = await fn(session, *args, **kwargs)
+                await session.commit()
+                return result
+            except Exception:  # noqa: BLE001
+                await session.rollback()
+                logger.exception("Database operation failed")
+                return None
 
     return wrapper
 
 
-@_with_session
-def get_or_create_user_by_telegram_id(
-    session,
+async def get_or_create_user_by_telegram_id(
     telegram_id: int,
     *,
     phone_number: str | None = None,
@@ -42,49 +62,85 @@ def get_or_create_user_by_telegram_id(
 ) -> User | None:
     """Return existing user by telegram_id or create a new one."""
 
+    # Checked before hopping to the service loop and opening a session.
     if telegram_id is None:
         return None
 
-    user = session.execute(select(User).where(User.telegram_id == telegram_id)).scalar_one_or_none()
-
-    if user is None:
-        # Create new user with telegram_id as primary identifier
-        phone = (phone_number or "").strip() if phone_number else None
-        user = User(
-            telegram_id=telegram_id,
-            phone_number=phone,
-            username=username,
-            first_name=first_name,
-            last_name=last_name,
-        )
-        session.add(user)
-    else:
-        # Update basic data if new values arrive
-        if phone_number:
-            phone = (phone_number or "").strip()
-            if phone:
-                user.phone_number = phone
-        if username is not None:
-            user.username = username
-        if first_name is not None:
-            user.first_name = first_name
-        if last_name is not None:
-            user.last_name = last_name
+    return await _get_or_upsert_user(
+        telegram_id,
+        {
+            "phone_number": (phone_number or "").strip() or None,
+            "username": username,
+            "first_name": first_name,
+            "last_name": last_name,
+        },
+    )
+
+
+@on_service_loop
+async def _get_or_upsert_user(telegram_id: int, profile: dict[str, str | None]) -> User | None:
+    # Fields left as ``None`` never overwrite the stored row, so they cannot make
+    # the cached copy stale.
+    cached = _recent_users.get(telegram_id)
+    if cached is not None and all(
+        value is None or getattr(cached, field) == value for field, value in profile.items()
+    ):
+        return cached
 
+    user = await _upsert_user(telegram_id, **profile)
+    if user is not None:
+        _recent_users[telegram_id] = user
     return user
 
 
 @_with_session
-def log_interaction_by_telegram_id(
+async def _upsert_user(
     session,
+    telegram_id: int,
+    *,
+    phone_number: str | None,
+    username: str | None,
+    first_name: str | None,
+    last_name: str | None,
+) -> User:
+    # Only fields with new values overwrite the stored row.
+    changes = {
+        field: value
+        for field, value in (
+            ("phone_number", phone_number),
+            ("username", username),
+            ("first_name", first_name),
+            ("last_name", last_name),
+        )
+        if value is not None
+    }
+
+    # Single round-trip upsert keyed by telegram_id; also safe against a
+    # concurrent insert of the same user.
+    stmt = (
+        sqlite_insert(User)
+        .values(telegram_id=telegram_id, **changes)
+        .on_conflict_do_update(
+            index_elements=[User.telegram_id],
+            set_={**changes, "last_seen_at": datetime.utcnow()},
+        )
+        .returning(User)
+    )
+    user = (await session.scalars(stmt)).one()
+    # Lets the log writer skip the user lookup for this user from now on.
+    remember_user_id(user.telegram_id, user.id)
+
+    return user
+
+
+def log_interaction_by_telegram_id(
     telegram_id: int,
     message_text: str,
     role: str = "user",
 ) -> None:
-    """Persist a single interaction message (user or assistant) for the given telegram_id.
+    """Queue a single interaction message (user or assistant) for the given telegram_id.
 
     Args:
-        session: Database session (injected by decorator).
         telegram_id: Telegram user ID.
         message_text: Message content.
         role: 'user' for user messages, 'assistant' for bot responses.
@@ -93,67 +149,88 @@ def log_interaction_by_telegram_id(
     if telegram_id is None:
         return
 
-    user = session.execute(select(User).where(User.telegram_id == telegram_id)).scalar_one_or_none()
-    if user is None:
-        # Create user if doesn't exist
-        user = User(telegram_id=telegram_id)
-        session.add(user)
-
-    session.add(
-        Interaction(
-            user=user,
-            telegram_id=telegram_id,
-            message_text=message_text or "",
-            role=role,
+    log_writer.enqueue(
+        LogEvent(
+            "interaction",
+            telegram_id,
+            {"message_text": message_text or "", "role": role},
         )
     )
 
 
-@_with_session
-def log_plate_by_telegram_id(session, telegram_id: int, plate: str) -> None:
-    """Persist a plate lookup for the given telegram_id."""
+def log_interactions_by_telegram_id(
+    telegram_id: int,
+    items: Iterable[tuple[str, str]],
+) -> None:
+    """Queue several ``(message_text, role)`` interactions for one telegram_id at once.
+
+    Used to log a user message together with the assistant's reply so both rows
+    are written in the same batch.
+    """
 
     if telegram_id is None:
         return
 
-    user = session.execute(select(User).where(User.telegram_id == telegram_id)).scalar_one_or_none()
-    if user is None:
-        user = User(telegram_id=telegram_id)
-        session.add(user)
-
-    session.add(
-        Plate(
-            user=user,
-            telegram_id=telegram_id,
-            plate=(plate or "").strip().upper(),
+    log_writer.enqueue(
+        *(
+            LogEvent(
+                "interaction",
+                telegram_id,
+                {"message_text": message_text or "", "role": role},
+            )
+            for message_text, role in items
         )
     )
 
 
-@_with_session
+def log_plate_by_telegram_id(telegram_id: int, plate: str) -> None:
+    """Queue a plate lookup for the given telegram_id.
+
+    ``plate`` is stored as given; callers pass the plate already normalized by
+    the Simit service.
+    """
+
+    if telegram_id is None:
+        return
+
+    log_writer.enqueue(LogEvent("plate", telegram_id, {"plate": plate}))
+
+
 def log_address_search_by_telegram_id(
-    session,
     telegram_id: int,
     raw_query: str,
     context: str,
 ) -> None:
-    """Persist an address search (geocode / route / nearby) for the given telegram_id."""
+    """Queue an address search (geocode / route / nearby) for the given telegram_id."""
 
     if telegram_id is None:
         return
 
-    user = session.execute(select(User).where(User.telegram_id == telegram_id)).scalar_one_or_none()
-    if user is None:
-        user = User(telegram_id=telegram_id)
-        session.add(user)
-
-    session.add(
-        AddressSearch(
-            user=user,
-            telegram_id=telegram_id,
-            raw_query=raw_query or "",
-            context=context or "",
+    log_writer.enqueue(
+        LogEvent(
+            "address_search",
+            telegram_id,
+            {"raw_query": raw_query or "", "context": context or ""},
         )
     )
 
 
+def log_address_searches_by_telegram_id(
+    telegram_id: int,
+    items: Iterable[tuple[str, str]],
+) -> None:
+    """Queue several ``(raw_query, context)`` address searches for one telegram_id at once."""
+
+    if telegram_id is None:
+        return
+
+    log_writer.enqueue(
+        *(
+            LogEvent(
+                "address_search",
+                telegram_id,
+                {"raw_query": raw_query or "", "context": context or ""},
+            )
+            for raw_query, context in items
+        )
+    )
@@ -2,8 +2,8 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, String, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Index, String, Text
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.session import Base
 
@@ -13,24 +13,31 @@ class User(Base):
 
     __tablename__ = "users"
 
-    id = Column(Integer, primary_key=True)
-    telegram_id = Column(BigInteger, unique=True, index=True, nullable=False)
+    id: Mapped[int] = mapped_column(primary_key=True)
+    telegram_id: Mapped[int] = mapped_column(BigInteger, unique=True, index=True)
 
     # Optional user data
-    phone_number = Column(String(50), nullable=True, index=True)
-    username = Column(String(255), nullable=True)
-    first_name = Column(String(255), nullable=True)
-    last_name = Column(String(255), nullable=True)
-
-    created_at = Column(DateTime, default=datetime.utcnow)
-    last_seen_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-
-    interactions = relationship("Interaction", back_populates="user", cascade="all, delete-orphan")
-    plates = relationship("Plate", back_populates="user", cascade="all, delete-orphan")
-    address_searches = relationship(
-        "AddressSearch",
-        back_populates="user",
-        cascade="all, delete-orphan",
+    phone_number: Mapped[str | None] = mapped_column(String(50), index=True)
+    username: Mapped[str | None] = mapped_column(String(255))
+    first_name: Mapped[str | None] = mapped_column(String(255))
+    last_name: Mapped[str | None] = mapped_column(String(255))
+
+    created_at: Mapped[datetime | None] = mapped_column(DateTime, default=datetime.utcnow)
+    last_seen_at: Mapped[datetime | None] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+    # Activity rows are written by foreign key only (see ``app.db.writer``) and the
+    # collections can grow large, so lazy loading is disabled: accessing them
+    # without an explicit eager-load option raises instead of issuing a query.
+    interactions: Mapped[list[Interaction]] = relationship(
+        back_populates="user", cascade="all, delete-orphan", lazy="raise"
+    )
+    plates: Mapped[list[Plate]] = relationship(
+        back_populates="user", cascade="all, delete-orphan", lazy="raise"
+    )
+    address_searches: Mapped[list[AddressSearch]] = relationship(
+        back_populates="user", cascade="all, delete-orphan", lazy="raise"
     )
 
 
@@ -38,49 +45,61 @@ class Interaction(Base):
     """Represents a message interaction (user or assistant)."""
 
     __tablename__ = "interactions"
+    # History reads filter by user and sort by time; one composite index serves
+    # both (and any telegram_id-only lookup), so telegram_id has no index of its own.
+    __table_args__ = (Index("ix_interactions_telegram_id_created_at", "telegram_id", "created_at"),)
 
-    id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
 
     # Denormalized for easier querying by telegram_id without joins.
-    telegram_id = Column(BigInteger, index=True, nullable=False)
+    telegram_id: Mapped[int] = mapped_column(BigInteger)
 
-    message_text = Column(Text, nullable=False)
+    message_text: Mapped[str] = mapped_column(Text)
     # 'user' for messages from the user, 'assistant' for bot responses
-    role = Column(String(20), nullable=False, default="user", index=True)
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    role: Mapped[str] = mapped_column(String(20), default="user", index=True)
+    created_at: Mapped[datetime | None] = mapped_column(
+        DateTime, default=datetime.utcnow, index=True
+    )
 
-    user = relationship("User", back_populates="interactions")
+    user: Mapped[User] = relationship(back_populates="interactions", lazy="raise")
 
 
 class Plate(Base):
     """License plates associated with a user."""
 
     __tablename__ = "plates"
+    __table_args__ = (Index("ix_plates_telegram_id_created_at", "telegram_id", "created_at"),)
 
-    id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
-    telegram_id = Column(BigInteger, index=True, nullable=False)
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    telegram_id: Mapped[int] = mapped_column(BigInteger)
 
-    plate = Column(String(20), nullable=False, index=True)
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    plate: Mapped[str] = mapped_column(String(20), index=True)
+    created_at: Mapped[datetime | None] = mapped_column(
+        DateTime, default=datetime.utcnow, index=True
+    )
 
-    user = relationship("User", back_populates="plates")
+    user: Mapped[User] = relationship(back_populates="plates", lazy="raise")
 
 
 class AddressSearch(Base):
     """Free-text address searches a user has performed."""
 
     __tablename__ = "address_searches"
+    __table_args__ = (
+        Index("ix_address_searches_telegram_id_created_at", "telegram_id", "created_at"),
+    )
 
-    id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
-    telegram_id = Column(BigInteger, index=True, nullable=False)
-
-    raw_query = Column(Text, nullable=False)
-    context = Column(String(50), nullable=True)  # e.g. "geocode", "route", "nearby_by_address"
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
-
-    user = relationship("User", back_populates="address_searches")
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    telegram_id: Mapped[int] = mapped_column(BigInteger)
 
+    raw_query: Mapped[str] = mapped_column(Text)
+    # e.g. "geocode", "route", "nearby_by_address"
+    context: Mapped[str | None] = mapped_column(String(50))
+    created_at: Mapped[datetime | None] = mapped_column(
+        DateTime, default=datetime.utcnow, index=True
+    )
 
+    user: Mapped[User] = relationship(back_populates="address_searches", lazy="raise")
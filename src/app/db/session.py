@@ -1,25 +1,71 @@
 from __future__ import annotations
 
+import asyncio
 from pathlib import Path
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase
+
+from app.services._loop import get_service_loop
 
 # Base directory two levels up: .../transmiBot/
 BASE_DIR = Path(__file__).resolve().parents[2]
 DB_DIR = BASE_DIR / "var"
 DB_DIR.mkdir(parents=True, exist_ok=True)
 
-DATABASE_URL = f"sqlite:///{DB_DIR / 'transmibot.db'}"
+DATABASE_URL = f"sqlite+aiosqlite:///{DB_DIR / 'transmibot.db'}"
 
-engine = create_engine(
+# Pooled aiosqlite connections are bound to the event loop that opened them, so the
+# engine is only ever used from the service loop (see ``app.services._loop``).
+# Connections to a local file never go stale, so they are neither pinged on
+# checkout nor recycled: each one keeps its PRAGMAs and page cache for the
+# lifetime of the process.
+engine = create_async_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    future=True,
+    pool_size=10,
+    max_overflow=20,
+)
+# WAL lets the log writer commit while other sessions read, and with
+# synchronous=NORMAL a commit no longer waits for an fsync (the database stays
+# consistent; only the last commits can be lost on power failure).
+_SQLITE_PRAGMAS: tuple[str, ...] = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
 )
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 
-Base = declarative_base()
+
+@event.listens_for(engine.sync_engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, _connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    for pragma in _SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+# Objects are handed back to callers after the session closes; keep them loaded.
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+
+class Base(DeclarativeBase):
+    """Declarative base for the ORM models in ``app.db.models``."""
+
+
+def _create_schema(connection) -> None:
+    Base.metadata.create_all(connection)
+    # create_all skips tables that already exist, so indexes added to a model
+    # later are created here for databases made by an older version.
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+async def _create_all() -> None:
+    async with engine.begin() as connection:
+        await connection.run_sync(_create_schema)
 
 
 def init_db() -> None:
@@ -29,6 +75,4 @@ def init_db() -> None:
     from app.db import models  # noqa: F401
 
     models  # silence linters
-    Base.metadata.create_all(bind=engine)
-
-
+    asyncio.run_coroutine_threadsafe(_create_all(), get_service_loop()).result()
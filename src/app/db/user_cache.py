@@ -0,0 +1,26 @@
+"""In-memory map from Telegram user id to ``users.id``.
+
+A user's primary key never changes once the row exists, so it only has to be
+looked up once per process. Only touched on the service loop (see
+``app.services._loop``), so it needs no lock.
+"""
+
+from __future__ import annotations
+
+from cachetools import LRUCache
+
+_MAX_USERS = 100_000
+
+_user_ids: LRUCache[int, int] = LRUCache(maxsize=_MAX_USERS)
+
+
+def get_user_id(telegram_id: int) -> int | None:
+    """Return the cached ``users.id`` for ``telegram_id``, or ``None`` if unknown."""
+
+    return _user_ids.get(telegram_id)
+
+
+def remember_user_id(telegram_id: int, user_id: int) -> None:
+    """Record the ``users.id`` of an existing user row."""
+
+    _user_ids[telegram_id] = user_id
@@ -0,0 +1,206 @@
+"""Background writer that batches activity logs into a few transactions.
+
+Logging a plate, an address search or a chat message used to open a session,
+look the user up, insert one row and commit — once per event. Events are now
+queued and a single consumer writes them in batches: one multi-row insert per
+table and one commit per batch. Users' row ids are cached, so the user upsert and
+id lookup only run for users the process has not seen yet.
+
+The consumer runs on the service loop (see ``app.services._loop``) so events can
+be enqueued from any thread or event loop without blocking the caller.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Literal
+
+from cachetools import TTLCache
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.db.models import AddressSearch, Interaction, Plate, User
+from app.db.session import SessionLocal
+from app.db.user_cache import get_user_id, remember_user_id
+from app.services._loop import get_service_loop, run_in_service_loop
+
+logger = logging.getLogger(__name__)
+
+# A batch is flushed once it holds this many events or this much time has passed
+# since its first event, whichever comes first.
+_BATCH_SIZE = 50
+_FLUSH_INTERVAL_SECONDS = 0.5
+# Logging is best effort: past this many pending events new ones are dropped.
+_MAX_PENDING_EVENTS = 10_000
+# Users re-issue the same lookup turn after turn. Repeats of a plate or address
+# search by the same user within this window are not logged again.
+_DEDUP_KINDS: frozenset[str] = frozenset({"plate", "address_search"})
+_DEDUP_TTL_SECONDS = 3600.0
+_DEDUP_MAX_KEYS = 50_000
+
+LogKind = Literal["interaction", "plate", "address_search"]
+
+
+@dataclass(frozen=True, slots=True)
+class LogEvent:
+    """A single activity record waiting to be persisted."""
+
+    kind: LogKind
+    telegram_id: int
+    payload: dict[str, Any]
+
+
+_MODELS: dict[str, type] = {
+    "interaction": Interaction,
+    "plate": Plate,
+    "address_search": AddressSearch,
+}
+
+
+async def _write_batch(events: list[LogEvent]) -> bool:
+    """Persist ``events`` in one transaction; return whether it was committed."""
+
+    async with SessionLocal() as session:
+        try:
+            user_ids: dict[int, int] = {}
+            unknown: set[int] = set()
+            for event in events:
+                user_id = get_user_id(event.telegram_id)
+                if user_id is None:
+                    unknown.add(event.telegram_id)
+                else:
+                    user_ids[event.telegram_id] = user_id
+            if unknown:
+                # Create missing users without a select-then-insert race, then
+                # resolve their ids in one query.
+                await session.execute(
+                    sqlite_insert(User)
+                    .values([{"telegram_id": telegram_id} for telegram_id in unknown])
+                    .on_conflict_do_nothing(index_elements=[User.telegram_id])
+                )
+                rows = await session.execute(
+                    select(User.telegram_id, User.id).where(User.telegram_id.in_(unknown))
+                )
+                resolved = dict(rows.tuples().all())
+                user_ids.update(resolved)
+
+            # One executemany per table through Core: no ORM objects or unit of
+            # work for rows that are never read back.
+            # The whole batch is stamped with one timestamp instead of evaluating
+            # the column's Python default once per row.
+            created_at = datetime.utcnow()
+            rows_by_model: dict[type, list[dict[str, Any]]] = defaultdict(list)
+            for event in events:
+                rows_by_model[_MODELS[event.kind]].append(
+                    {
+                        "user_id": user_ids[event.telegram_id],
+                        "telegram_id": event.telegram_id,
+                        "created_at": created_at,
+                        **event.payload,
+                    }
+                )
+            for model, rows in rows_by_model.items():
+                await session.execute(insert(model), rows)
+            await session.commit()
+            if unknown:
+                for telegram_id, user_id in resolved.items():
+                    remember_user_id(telegram_id, user_id)
+            return True
+        except Exception:  # noqa: BLE001
+            await session.rollback()
+            logger.exception("Failed to persist a batch of %d log events", len(events))
+            return False
+
+
+def _dedup_key(event: LogEvent) -> tuple[Any, ...]:
+    normalized = tuple(
+        (field, " ".join(str(value).casefold().split()))
+        for field, value in sorted(event.payload.items())
+    )
+    return (event.kind, event.telegram_id, normalized)
+
+
+class LogWriter:
+    """Queue of pending log events drained by a single consumer task."""
+
+    def __init__(self) -> None:
+        self._queue: asyncio.Queue[LogEvent | None] | None = None
+        self._task: asyncio.Task[None] | None = None
+        # Only touched on the service loop, so it needs no lock.
+        self._recent: TTLCache[tuple[Any, ...], bool] = TTLCache(
+            maxsize=_DEDUP_MAX_KEYS, ttl=_DEDUP_TTL_SECONDS
+        )
+
+    def enqueue(self, *events: LogEvent) -> None:
+        """Schedule ``events`` for persistence; safe to call from any thread.
+
+        Events passed together are queued in one hop and land in the same batch
+        unless it is already full.
+        """
+
+        get_service_loop().call_soon_threadsafe(self._put, events)
+
+    def _put(self, events: tuple[LogEvent, ...]) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=_MAX_PENDING_EVENTS)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(self._queue))
+        for event in events:
+            key = _dedup_key(event) if event.kind in _DEDUP_KINDS else None
+            if key is not None and key in self._recent:
+                continue
+            try:
+                self._queue.put_nowait(event)
+            except asyncio.QueueFull:
+                logger.warning("Log writer queue is full; dropping %s event", event.kind)
+                continue
+            # Only events actually queued suppress their repeats.
+            if key is not None:
+                self._recent[key] = True
+
+    async def _run(self, queue: asyncio.Queue[LogEvent | None]) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = loop.time() + _FLUSH_INTERVAL_SECONDS
+            while len(batch) < _BATCH_SIZE:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for(queue.get(), remaining)
+                except TimeoutError:
+                    break
+                if event is None:
+                    stopping = True
+                    break
+                batch.append(event)
+            if not await _write_batch(batch):
+                # The events were lost, so their repeats must be logged again.
+                for event in batch:
+                    if event.kind in _DEDUP_KINDS:
+                        self._recent.pop(_dedup_key(event), None)
+
+    async def _close(self) -> None:
+        if self._queue is None or self._task is None or self._task.done():
+            return
+        # The sentinel goes behind every pending event, so they are flushed first.
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def close(self) -> None:
+        """Flush pending events and stop the consumer (no-op if never started)."""
+
+        await run_in_service_loop(self._close())
+
+
+log_writer = LogWriter()
@@ -5,74 +5,109 @@ health checks when the bot operates in long-polling mode. Cloud Run expects
 the container to accept connections on ``PORT`` even if the application does
 not expose an HTTP interface by default. The health server keeps the port
 open, reports readiness, and can be shut down gracefully once polling stops.
+
+The server is a plain ``asyncio`` stream server running on the service loop
+(see ``app.services._loop``), so it needs neither a thread of its own nor a
+thread per probe.
 """
 
 from __future__ import annotations
 
+import asyncio
 import logging
 from contextlib import suppress
-from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
-from threading import Event, Thread
-
-logger = logging.getLogger(__name__)
 
-_SUCCESS_PATHS: tuple[str, ...] = ("/healthz", "/_ah/health", "/")
+from app.services._loop import get_service_loop
 
+logger = logging.getLogger(__name__)
 
-class _HealthRequestHandler(BaseHTTPRequestHandler):
-    server_version = "TransmiBotHealthServer/1.0"
-
-    def do_GET(self) -> None:  # noqa: N802 - API requires camelCase
-        if self.path in _SUCCESS_PATHS:
-            self.send_response(200)
-            self.send_header("Content-Type", "text/plain; charset=utf-8")
-            self.end_headers()
-            self.wfile.write(b"ok")
+# Matched against the raw request bytes, so probes are never decoded.
+_SUCCESS_PATHS: frozenset[bytes] = frozenset({b"/healthz", b"/_ah/health", b"/"})
+_SERVER_NAME = "TransmiBotHealthServer/1.0"
+# Probes send a few short headers; anything slower or larger is dropped.
+_READ_TIMEOUT_SECONDS = 5.0
+_STOP_TIMEOUT_SECONDS = 5.0
+
+
+def _response(status: str, body: bytes) -> bytes:
+    head = (
+        f"HTTP/1.1 {status}\r\n"
+        f"Server: {_SERVER_NAME}\r\n"
+        "Content-Type: text/plain; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n"
+        "\r\n"
+    )
+    return head.encode("ascii") + body
+
+
+# Responses are fixed, so they are encoded once instead of on every probe.
+_OK_RESPONSE = _response("200 OK", b"ok")
+_NOT_FOUND_RESPONSE = _response("404 Not Found", b"not found")
+_NOT_IMPLEMENTED_RESPONSE = _response("501 Not Implemented", b"unsupported method")
+
+
+async def _handle_probe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        # Read the whole request head so closing the socket does not reset it
+        # before the client has read the response.
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), _READ_TIMEOUT_SECONDS)
+        method, _, rest = head.partition(b" ")
+        # Probes may carry a query string (``/healthz?probe=1``); only the path matters.
+        path = rest.partition(b" ")[0].partition(b"?")[0]
+        logger.debug("Health probe: %r %r", method, path)
+
+        if method != b"GET":
+            writer.write(_NOT_IMPLEMENTED_RESPONSE)
+        elif path in _SUCCESS_PATHS:
+            writer.write(_OK_RESPONSE)
         else:
-            self.send_response(404)
-            self.send_header("Content-Type", "text/plain; charset=utf-8")
-            self.end_headers()
-            self.wfile.write(b"not found")
+            writer.write(_NOT_FOUND_RESPONSE)
+        await writer.drain()
+    except (TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, OSError):
+        pass
+    finally:
+        writer.close()
+        with suppress(Exception):
+            await writer.wait_closed()
 
-    def log_message(self, fmt: str, *args: object) -> None:  # noqa: D401
-        """Route BaseHTTPRequestHandler logs through the standard logger."""
 
-        logger.debug("Health probe: %s", fmt % args)
+async def _close_server(server: asyncio.Server) -> None:
+    server.close()
+    await server.wait_closed()
 
 
 class HealthServer:
-    """Threaded HTTP server reporting container readiness."""
+    """Asyncio HTTP server reporting container readiness."""
 
     def __init__(self, host: str, port: int) -> None:
-        self._server = ThreadingHTTPServer((host, port), _HealthRequestHandler)
-        self._thread = Thread(target=self._server.serve_forever, daemon=True)
-        self._shutdown_event = Event()
+        self._host = host
+        self._port = port
+        self._server: asyncio.Server | None = None
 
     def start(self) -> None:
-        logger.info(
-            "Starting health server",
-            extra={"host": self._server.server_address[0], "port": self._server.server_address[1]},
-        )
-        self._thread.start()
+        """Bind the port and start serving; raises ``OSError`` if it cannot bind."""
+
+        logger.info("Starting health server", extra={"host": self._host, "port": self._port})
+        self._server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(_handle_probe, self._host, self._port), get_service_loop()
+        ).result()
 
     def stop(self) -> None:
-        if self._shutdown_event.is_set():
+        if self._server is None:
             return
 
-        self._shutdown_event.set()
+        server, self._server = self._server, None
         logger.info("Stopping health server")
         with suppress(Exception):
-            self._server.shutdown()
-        with suppress(Exception):
-            self._server.server_close()
-        self._thread.join(timeout=5)
+            asyncio.run_coroutine_threadsafe(_close_server(server), get_service_loop()).result(
+                timeout=_STOP_TIMEOUT_SECONDS
+            )
 
 
 def start_health_server(host: str, port: int) -> HealthServer:
-    """Instantiate and run a threaded health server."""
+    """Instantiate and run a health server on the service loop."""
 
     health_server = HealthServer(host, port)
     health_server.start()
     return health_server
-
-
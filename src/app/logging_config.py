@@ -1,34 +1,53 @@
+import atexit
+import copy
 import logging
+import queue
 from logging.config import dictConfig
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any
 
-from app.config import get_settings
+from app.config import Settings, get_settings
 
-
-def configure_logging() -> logging.Logger:
-    settings = get_settings()
-    dictConfig(
-        {
-            "version": 1,
-            "disable_existing_loggers": False,
-            "formatters": {
-                "standard": {
-                    "format": "%(asctime)s | %(levelname)s | %(name)s | %(message)s"
-                }
-            },
-            "handlers": {
-                "default": {
-                    "class": "logging.StreamHandler",
-                    "formatter": "standard",
-                    "level": settings.log_level,
-                }
-            },
-            "loggers": {
-                "": {
-                    "handlers": ["default"],
-                    "level": settings.log_level,
-                }
-            },
+# Static part of the logging setup; only the levels come from settings.
+_LOGGING_CONFIG_TEMPLATE: dict[str, Any] = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {"standard": {"format": "%(asctime)s | %(levelname)s | %(name)s | %(message)s"}},
+    "handlers": {
+        "default": {
+            "class": "logging.StreamHandler",
+            "formatter": "standard",
+            "level": None,
         }
-    )
-    return logging.getLogger("app")
+    },
+    "loggers": {
+        "": {
+            "handlers": ["default"],
+            "level": None,
+        }
+    },
+}
 
+
+def configure_logging(settings: Settings | None = None) -> logging.Logger:
+    if settings is None:
+        settings = get_settings()
+    # dictConfig consumes (pops from) the dicts it is given, so work on a copy.
+    config = copy.deepcopy(_LOGGING_CONFIG_TEMPLATE)
+    config["handlers"]["default"]["level"] = settings.log_level
+    config["loggers"][""]["level"] = settings.log_level
+    dictConfig(config)
+
+    # Callers only enqueue the record; a listener thread formats it and writes it
+    # through the stream handler, so logging never blocks on the stream.
+    root = logging.getLogger()
+    stream_handler = logging.getHandlerByName("default")
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    root.removeHandler(stream_handler)
+    root.addHandler(QueueHandler(log_queue))
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    # Registered after logging's own exit hook, so it runs first and flushes
+    # pending records while the stream handler is still open.
+    atexit.register(listener.stop)
+    return logging.getLogger("app")
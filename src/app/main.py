@@ -1,24 +1,26 @@
 import logging
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
 from app.config import get_settings
 from app.db import init_db
 from app.exceptions import ConfigurationError, ExternalServiceError
-from app.health import HealthServer, start_health_server
 from app.logging_config import configure_logging
 from app.telegram.bot import build_application
 
+if TYPE_CHECKING:
+    from app.health import HealthServer
+
 
 def main() -> None:
-    configure_logging()
+    settings = get_settings()
+    configure_logging(settings)
     # Ensure database schema is initialized before serving traffic.
     init_db()
-    settings = get_settings()
     logger = logging.getLogger(__name__)
     logger.info("Bootstrapping TransmiBot", extra={"env": settings.environment})
 
     application = build_application()
-    health_server: Optional[HealthServer] = None
+    health_server: Optional["HealthServer"] = None
 
     try:
         if settings.telegram_webhook_url:
@@ -32,6 +34,9 @@ def main() -> None:
                 allowed_updates=list(settings.telegram_allowed_updates),
             )
         else:
+            # Only polling mode needs the health endpoint; webhook mode never imports it.
+            from app.health import start_health_server
+
             try:
                 health_server = start_health_server("0.0.0.0", settings.port)
             except OSError as exc:
@@ -1,7 +1,17 @@
 """Service layer for application features (e.g., persistence, APIs, automation)."""
 
-from .simit import capture_simit_screenshot_service
+from ._http import close_http_client
+from .simit import (
+    capture_simit_screenshot_service,
+    close_simit_browser,
+    warm_up_simit_browser,
+)
 
-__all__: list[str] = ["capture_simit_screenshot_service"]
+__all__: list[str] = [
+    "capture_simit_screenshot_service",
+    "close_http_client",
+    "close_simit_browser",
+    "warm_up_simit_browser",
+]
 
 
@@ -0,0 +1,44 @@
+"""Shared HTTP client for calls to external APIs.
+
+Opening an ``httpx.AsyncClient`` per request pays a TCP and TLS handshake every
+time. A single client keeps connections alive (and multiplexes them over HTTP/2)
+across requests. Like every pooled async resource it is bound to the loop that
+created it, so it is only used from the service loop (see ``app.services._loop``).
+"""
+
+from __future__ import annotations
+
+import httpx
+
+from app.services._loop import run_in_service_loop
+
+_DEFAULT_TIMEOUT_SECONDS = 10.0
+# Idle connections are kept for five minutes (httpx defaults to five seconds), so
+# users chatting a few minutes apart do not pay a new TLS handshake each time.
+_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=300.0)
+
+_client: httpx.AsyncClient | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it on first use (call on the service loop)."""
+
+    global _client
+    if _client is None or _client.is_closed:
+        # Failed calls are reported back to the user, never retried behind their back.
+        transport = httpx.AsyncHTTPTransport(http2=True, limits=_LIMITS, retries=0)
+        _client = httpx.AsyncClient(transport=transport, timeout=_DEFAULT_TIMEOUT_SECONDS)
+    return _client
+
+
+async def _close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def close_http_client() -> None:
+    """Close the shared client and its connections (no-op if never created)."""
+
+    await run_in_service_loop(_close_client())
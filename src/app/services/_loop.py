@@ -0,0 +1,74 @@
+"""Long-lived event loop shared by the service layer.
+
+Every agent turn is driven on a brand-new event loop (``asyncio.run`` inside a
+worker thread). Objects bound to a loop — a
+Playwright browser, asyncio locks and futures — therefore cannot be kept at
+module level and reused across turns. Services that need process-wide state run
+their coroutines on this loop instead; it lives on a daemon thread for the whole
+process.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+from collections.abc import Callable, Coroutine
+from typing import Any, ParamSpec, TypeVar
+
+_P = ParamSpec("_P")
+_T = TypeVar("_T")
+
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_lock = threading.Lock()
+
+
+def get_service_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared service loop, starting its thread on first use."""
+
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="service-loop", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+async def run_in_service_loop(coro: Coroutine[Any, Any, _T]) -> _T:
+    """Await ``coro`` on the service loop from whichever loop is currently running."""
+
+    loop = get_service_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+def on_service_loop(
+    fn: Callable[_P, Coroutine[Any, Any, _T]],
+) -> Callable[_P, Coroutine[Any, Any, _T]]:
+    """Decorate an ``async def`` service function so it always runs on the service loop."""
+
+    @functools.wraps(fn)
+    async def wrapper(*args: _P.args, **kwargs: _P.kwargs) -> _T:
+        return await run_in_service_loop(fn(*args, **kwargs))
+
+    return wrapper
+
+
+class InflightAbandoned(Exception):
+    """The caller running a shared in-flight operation was cancelled before it finished."""
+
+
+def fail_inflight(future: asyncio.Future[Any], exc: BaseException) -> None:
+    """Fail a single-flight ``future`` with the error that ended the shared operation.
+
+    Waiters only share the outcome of the operation, not the cancellation of the
+    caller that happened to run it: in that case they get ``InflightAbandoned``
+    (so they can run the operation themselves) instead of being cancelled.
+    """
+
+    future.set_exception(exc if isinstance(exc, Exception) else InflightAbandoned())
+    # Marks the exception as retrieved, so a future nobody waited on is not
+    # reported as "exception was never retrieved".
+    future.exception()
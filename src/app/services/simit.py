@@ -3,34 +3,247 @@
 This module contains the core implementation used to capture a screenshot of the
 Simit account status page. Higher layers (e.g. tools, agents) should depend on
 this service instead of using Playwright directly.
+
+A single headless Chromium is launched lazily and shared by every capture; each
+request only opens a short-lived ``BrowserContext``. The browser lives on the
+service loop (see ``app.services._loop``) because Playwright objects are bound to
+the event loop that created them.
 """
 
 from __future__ import annotations
 
+import asyncio
 import base64
 import logging
+import re
+import string
+from contextlib import suppress
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any
+from typing import Any, Final
 
+from cachetools import TTLCache
+from playwright.async_api import Browser, Playwright, Route, async_playwright
 from playwright.async_api import Error as PlaywrightError
 from playwright.async_api import TimeoutError as PlaywrightTimeoutError
-from playwright.async_api import async_playwright
+
+from app.services._loop import (
+    InflightAbandoned,
+    fail_inflight,
+    on_service_loop,
+    run_in_service_loop,
+)
 
 logger = logging.getLogger(__name__)
 
 _SIMIT_BASE_URL: str = "https://www.fcm.org.co/simit/#/estado-cuenta?numDocPlacaProp={plate}"
+# The template has a single field, so it is split once and concatenated per call.
+_URL_PREFIX, _URL_SUFFIX = _SIMIT_BASE_URL.split("{plate}")
+# Uppercases ASCII letters and drops the separators users type inside plates.
+_PLATE_TABLE: Final = str.maketrans(string.ascii_lowercase, string.ascii_uppercase, "- ")
+# Colombian plates: three letters, then three digits (cars) or two digits and a
+# letter (motorcycles); older motorcycle plates have no final letter. Anything
+# else is rejected before opening a browser.
+_PLATE_PATTERN: Final = re.compile(r"[A-Z]{3}(?:\d{3}|\d{2}[A-Z]?)", re.ASCII)
 _DEFAULT_TIMEOUT_MS: int = 20000
 _SCREENSHOT_ROOT = Path(__file__).resolve().parents[3] / "var" / "screenshots"
+# Upper bound for the post-load render wait; the wait returns as soon as the ready
+# selector shows up.
 _POST_LOAD_WAIT_MS: int = 7000
+_SPINNER_WAIT_MS: int = 2000
+_WARM_UP_TIMEOUT_MS: int = 15000
+# Any syntactically valid plate works; the warm-up only needs the SPA to load.
+_WARM_UP_PLATE = "AAA000"
 _CONTAINER_SELECTOR = ".container-fluid"
+# Rendered once the SPA has the account status: result rows or the "no records" alert.
+_READY_SELECTOR = ".container-fluid table tbody tr, .container-fluid .alert"
+_SPINNER_GONE_JS = "() => document.querySelector('.loading, .spinner') === null"
+# JPEG is encoded much faster than PNG and is plenty for a visual snapshot; PNG is
+# kept for callers that need a lossless image.
+_JPEG_QUALITY: int = 70
+# Flags for a headless screenshot workload: fewer helper processes and no
+# background features. ``--single-process`` is deliberately left out: it is not
+# supported by Playwright and crashes when several contexts are opened.
+_BROWSER_ARGS: tuple[str, ...] = (
+    "--disable-dev-shm-usage",
+    "--no-zygote",
+    "--disable-gpu",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-sync",
+    "--no-default-browser-check",
+    "--no-first-run",
+    "--disable-features=Translate,MediaRouter,OptimizationHints",
+    "--hide-scrollbars",
+    "--mute-audio",
+)
+# Subresources the account-status table does not need. CSS is kept so the
+# screenshot still renders the layout.
+_BLOCKED_RESOURCE_TYPES: frozenset[str] = frozenset({"image", "media", "font"})
+_BLOCKED_URL_FRAGMENTS: tuple[str, ...] = (
+    "googletagmanager",
+    "google-analytics",
+    "doubleclick",
+    "hotjar",
+    "facebook",
+)
+
+# Account status does not change second to second; successful captures are reused
+# for a short while (keyed by normalized plate, whether text was extracted and the
+# image format, without the base64 payload).
+_RESULT_TTL_SECONDS: float = 120.0
+_RESULT_CACHE_SIZE: int = 256
+
+_browser_lock = asyncio.Lock()
+_playwright: Playwright | None = None
+_browser: Browser | None = None
+
+_result_cache: TTLCache[tuple[str, bool, bool], dict[str, Any]] = TTLCache(
+    maxsize=_RESULT_CACHE_SIZE, ttl=_RESULT_TTL_SECONDS
+)
+# Captures currently running, keyed like ``_result_cache`` (single-flight).
+_inflight: dict[tuple[str, bool, bool], asyncio.Future[dict[str, Any]]] = {}
+
+
+async def _get_browser() -> Browser:
+    """Return the shared Chromium instance, relaunching it if it has disconnected."""
+
+    global _playwright, _browser
+
+    async with _browser_lock:
+        if _browser is not None and _browser.is_connected():
+            return _browser
+
+        if _browser is not None:
+            logger.warning("Shared Chromium instance disconnected; relaunching it")
+            with suppress(PlaywrightError):
+                await _browser.close()
+
+        if _playwright is None:
+            _playwright = await async_playwright().start()
+
+        # The container runs as root, where Chromium's sandbox cannot be used.
+        _browser = await _playwright.chromium.launch(
+            headless=True, chromium_sandbox=False, args=list(_BROWSER_ARGS)
+        )
+        logger.info("Launched shared Chromium instance for Simit captures")
+        return _browser
+
+
+async def _close_browser() -> None:
+    global _playwright, _browser
+
+    async with _browser_lock:
+        if _browser is not None:
+            with suppress(PlaywrightError):
+                await _browser.close()
+            _browser = None
+        if _playwright is not None:
+            with suppress(PlaywrightError):
+                await _playwright.stop()
+            _playwright = None
+
+
+async def _block_heavy_assets(route: Route) -> None:
+    request = route.request
+    if request.resource_type in _BLOCKED_RESOURCE_TYPES or any(
+        fragment in request.url for fragment in _BLOCKED_URL_FRAGMENTS
+    ):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+def _write_and_encode(screenshot_bytes: bytes, output_path: Path, *, encode: bool) -> str | None:
+    """Persist the screenshot and optionally base64-encode it (runs in a worker thread)."""
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_bytes(screenshot_bytes)
+    return base64.b64encode(screenshot_bytes).decode("ascii") if encode else None
+
+
+def _read_and_encode(path: Path) -> str:
+    return base64.b64encode(path.read_bytes()).decode("ascii")
+
+
+async def _from_cache(key: tuple[str, bool, bool], include_base64: bool) -> dict[str, Any] | None:
+    cached = _result_cache.get(key)
+    if cached is None:
+        return None
+
+    result = {**cached, "container_text": list(cached["container_text"])}
+    if include_base64:
+        try:
+            result["content_b64"] = await asyncio.to_thread(
+                _read_and_encode, Path(cached["file_path"])
+            )
+        except OSError:
+            # The file was removed from disk; capture it again.
+            _result_cache.pop(key, None)
+            return None
+
+    logger.debug("Serving cached Simit capture", extra={"plate": key[0]})
+    return result
+
+
+@on_service_loop
+async def warm_up_simit_browser() -> None:
+    """Launch the shared browser and load the Simit SPA once, ahead of real traffic.
+
+    The first capture otherwise pays for the Chromium launch and for fetching and
+    compiling the SPA bundle. Failures are logged and ignored: a cold first
+    capture is still correct.
+    """
+
+    try:
+        browser = await _get_browser()
+        context = await browser.new_context()
+        try:
+            await context.route("**/*", _block_heavy_assets)
+            page = await context.new_page()
+            await page.goto(
+                _URL_PREFIX + _WARM_UP_PLATE + _URL_SUFFIX,
+                wait_until="domcontentloaded",
+                timeout=_WARM_UP_TIMEOUT_MS,
+            )
+        finally:
+            await context.close()
+    except PlaywrightError:
+        logger.warning("Simit browser warm-up failed", exc_info=True)
+    else:
+        logger.info("Simit browser warmed up")
+
 
+async def close_simit_browser() -> None:
+    """Close the shared browser and Playwright driver (no-op if never started)."""
 
-async def capture_simit_screenshot_service(plate: str) -> dict[str, Any]:
+    await run_in_service_loop(_close_browser())
+
+
+@on_service_loop
+async def capture_simit_screenshot_service(
+    plate: str,
+    *,
+    include_base64: bool = False,
+    extract_text: bool = False,
+    high_fidelity: bool = False,
+) -> dict[str, Any]:
     """Core implementation that captures a Simit screenshot for the given plate.
 
     This function is intentionally framework-agnostic so it can be reused from
     different entry points (tools, API endpoints, etc.).
+
+    The screenshot is always written to disk and referenced by ``file_path``;
+    it is a JPEG unless ``high_fidelity`` asks for a lossless PNG (``mime_type``
+    tells which). The
+    base64 payload (``content_b64``) is only included when ``include_base64`` is
+    set, since it is large and useless inside an LLM context. Likewise the
+    container's inner text is only read when ``extract_text`` is set;
+    otherwise ``container_text`` is an empty list.
+
+    Successful captures are cached per plate for ``_RESULT_TTL_SECONDS``.
+    Concurrent requests for the same plate share the capture already in flight
+    (including its error, if any) instead of launching their own browser session.
     """
 
     if not plate or not plate.strip():
@@ -40,55 +253,141 @@ async def capture_simit_screenshot_service(plate: str) -> dict[str, Any]:
             "message": "Vehicle plate is required to capture the Simit screenshot.",
         }
 
-    normalized_plate = plate.strip().upper().replace("-", "").replace(" ", "")
+    normalized_plate = plate.strip().translate(_PLATE_TABLE)
+    if not _PLATE_PATTERN.fullmatch(normalized_plate):
+        return {
+            "status": "error",
+            "error_type": "validation",
+            "message": (
+                "Vehicle plate must look like ABC123 (cars) or ABC12D / ABC12 (motorcycles)."
+            ),
+        }
+
+    key = (normalized_plate, extract_text, high_fidelity)
+
+    cached = await _from_cache(key, include_base64)
+    if cached is not None:
+        return cached
+
+    inflight = _inflight.get(key)
+    if inflight is not None:
+        try:
+            shared = await asyncio.shield(inflight)
+        except InflightAbandoned:
+            # The caller running the capture was cancelled; run it for this one.
+            return await capture_simit_screenshot_service(
+                plate,
+                include_base64=include_base64,
+                extract_text=extract_text,
+                high_fidelity=high_fidelity,
+            )
+        if shared.get("status") == "success":
+            cached = await _from_cache(key, include_base64)
+            if cached is not None:
+                return cached
+        return dict(shared)
 
-    target_url = _SIMIT_BASE_URL.format(plate=normalized_plate)
-    screenshot_bytes: bytes | None = None
+    future: asyncio.Future[dict[str, Any]] = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        result = await _capture(
+            normalized_plate,
+            include_base64=include_base64,
+            extract_text=extract_text,
+            high_fidelity=high_fidelity,
+        )
+    except BaseException as exc:
+        fail_inflight(future, exc)
+        raise
+    finally:
+        del _inflight[key]
+
+    shared = {field: value for field, value in result.items() if field != "content_b64"}
+    if result.get("status") == "success":
+        _result_cache[key] = shared
+    future.set_result(shared)
+    return result
+
+
+async def _capture(
+    normalized_plate: str, *, include_base64: bool, extract_text: bool, high_fidelity: bool
+) -> dict[str, Any]:
+    """Drive the shared browser through one Simit capture (no caching)."""
+
+    target_url = _URL_PREFIX + normalized_plate + _URL_SUFFIX
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    if high_fidelity:
+        screenshot_options: dict[str, Any] = {"type": "png"}
+        extension, mime_type = "png", "image/png"
+    else:
+        screenshot_options = {"type": "jpeg", "quality": _JPEG_QUALITY}
+        extension, mime_type = "jpg", "image/jpeg"
+    output_path = _SCREENSHOT_ROOT / f"simit_{normalized_plate}_{timestamp}.{extension}"
     container_texts: list[str] | None = None
+    persist_task: asyncio.Task[str | None] | None = None
 
     try:
-        async with async_playwright() as playwright:
-            browser = await playwright.chromium.launch(headless=True)
+        browser = await _get_browser()
+        context = await browser.new_context(viewport={"width": 1280, "height": 720})
+        try:
+            await context.route("**/*", _block_heavy_assets)
+            page = await context.new_page()
+
+            logger.info("Loading Simit account status page", extra={"plate": normalized_plate})
+
+            response = await page.goto(
+                target_url, wait_until="networkidle", timeout=_DEFAULT_TIMEOUT_MS
+            )
+            if response and response.status >= 400:
+                logger.warning(
+                    "Simit responded with HTTP %s",
+                    response.status,
+                    extra={"plate": normalized_plate},
+                )
+
+            # ``goto`` already waited for networkidle; go straight to the render check.
             try:
-                context = await browser.new_context(viewport={"width": 1280, "height": 720})
-                try:
-                    page = await context.new_page()
+                await page.locator(_READY_SELECTOR).first.wait_for(
+                    state="visible", timeout=_POST_LOAD_WAIT_MS
+                )
+            except PlaywrightTimeoutError:
+                logger.info(
+                    "Ready selector did not appear; waiting for loading indicator instead",
+                    extra={"plate": normalized_plate, "selector": _READY_SELECTOR},
+                )
+                with suppress(PlaywrightTimeoutError):
+                    await page.wait_for_function(_SPINNER_GONE_JS, timeout=_SPINNER_WAIT_MS)
 
-                    logger.info(
-                        "Loading Simit account status page", extra={"plate": normalized_plate}
+            container_locator = page.locator(_CONTAINER_SELECTOR)
+            try:
+                await container_locator.first.wait_for(state="visible", timeout=_DEFAULT_TIMEOUT_MS)
+            except PlaywrightTimeoutError:
+                logger.warning(
+                    "Timed out waiting for container selector to appear",
+                    extra={"plate": normalized_plate, "selector": _CONTAINER_SELECTOR},
+                )
+                # Without the container, fall back to the viewport rather than the full page.
+                screenshot_bytes = await page.screenshot(**screenshot_options)
+            else:
+                # Element screenshots scroll the container into view and only encode
+                # its pixels, which is far smaller than a full-page capture.
+                screenshot = container_locator.first.screenshot(**screenshot_options)
+                if extract_text:
+                    container_texts, screenshot_bytes = await asyncio.gather(
+                        container_locator.all_inner_texts(), screenshot
                     )
+                else:
+                    # Skipping the text read saves a CDP round-trip over the subtree.
+                    screenshot_bytes = await screenshot
 
-                    response = await page.goto(
-                        target_url, wait_until="networkidle", timeout=_DEFAULT_TIMEOUT_MS
-                    )
-                    if response and response.status >= 400:
-                        logger.warning(
-                            "Simit responded with HTTP %s",
-                            response.status,
-                            extra={"plate": normalized_plate},
-                        )
-
-                    await page.wait_for_load_state("networkidle", timeout=_DEFAULT_TIMEOUT_MS)
-                    await page.wait_for_timeout(_POST_LOAD_WAIT_MS)
-
-                    container_locator = page.locator(_CONTAINER_SELECTOR)
-                    try:
-                        await container_locator.first.wait_for(
-                            state="visible", timeout=_DEFAULT_TIMEOUT_MS
-                        )
-                    except PlaywrightTimeoutError:
-                        logger.warning(
-                            "Timed out waiting for container selector to appear",
-                            extra={"plate": normalized_plate, "selector": _CONTAINER_SELECTOR},
-                        )
-                    else:
-                        container_texts = await container_locator.all_inner_texts()
-
-                    screenshot_bytes = await page.screenshot(full_page=True, type="png")
-                finally:
-                    await context.close()
-            finally:
-                await browser.close()
+            # Encoding and the disk write overlap with the context teardown below.
+            persist_task = asyncio.create_task(
+                asyncio.to_thread(
+                    _write_and_encode, screenshot_bytes, output_path, encode=include_base64
+                )
+            )
+        finally:
+            await context.close()
 
     except PlaywrightTimeoutError as exc:
         logger.exception(
@@ -123,15 +422,8 @@ async def capture_simit_screenshot_service(plate: str) -> dict[str, Any]:
             "details": str(exc),
         }
 
-    screenshot_encoded = base64.b64encode(screenshot_bytes).decode("ascii")
-
-    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
-    filename = f"simit_{normalized_plate}_{timestamp}.png"
-    output_path = _SCREENSHOT_ROOT / filename
-
     try:
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        output_path.write_bytes(screenshot_bytes)
+        screenshot_encoded = await persist_task
     except OSError as exc:
         logger.exception(
             "Failed to persist Simit screenshot to disk",
@@ -149,13 +441,16 @@ async def capture_simit_screenshot_service(plate: str) -> dict[str, Any]:
         extra={"plate": normalized_plate, "path": str(output_path)},
     )
 
-    return {
+    result: dict[str, Any] = {
         "status": "success",
         "plate": normalized_plate,
         "url": target_url,
         "file_path": str(output_path),
+        "mime_type": mime_type,
         "container_text": container_texts or [],
-        "content_b64": screenshot_encoded,
     }
+    if screenshot_encoded is not None:
+        result["content_b64"] = screenshot_encoded
+    return result
 
 
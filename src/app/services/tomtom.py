@@ -15,20 +15,177 @@ that callers (e.g. the agent tools) can safely surface human‑friendly messages
 
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Any
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Final
 from urllib.parse import quote
 
 import httpx
+from cachetools import TTLCache
+
+try:  # Optional speed-up: orjson parses TomTom payloads several times faster.
+    import orjson
+except ImportError:  # pragma: no cover - depends on the installed extras
+    orjson = None
+
+try:  # Optional: persists geocoding results across restarts and worker processes.
+    import diskcache
+except ImportError:  # pragma: no cover - depends on the installed extras
+    diskcache = None
 
 from app.config import get_settings
+from app.services._http import get_http_client
+from app.services._loop import InflightAbandoned, fail_inflight, on_service_loop
 
 logger = logging.getLogger(__name__)
 
 _SEARCH_BASE_URL = "https://api.tomtom.com/search/2/search"
-_POI_SEARCH_BASE_URL = "https://api.tomtom.com/search/2/search"
 _ROUTING_BASE_URL = "https://api.tomtom.com/routing/1/calculateRoute"
-_DEFAULT_TIMEOUT_SECONDS = 10.0
+_BATCH_SEARCH_URL = "https://api.tomtom.com/search/2/batch/sync.json"
+# Fixed query parameters; only the API key is added per request.
+_ROUTE_PARAMS: Final = MappingProxyType(
+    {"traffic": "true", "travelMode": "car", "routeType": "fastest"}
+)
+_POI_SEARCH_PARAMS: Final = MappingProxyType(
+    {
+        "limit": 5,  # Traemos solo los 5 más cercanos para no saturar al usuario
+        "idxSet": "POI",  # Importante: Solo buscar Puntos de Interés, no direcciones
+    }
+)
+
+# Filled in by ``_get_api_key`` the first time the key is found in settings.
+_api_key: str | None = None
+
+# Places like "Portal Eldorado" are geocoded over and over and do not move;
+# successful lookups are reused for a day, keyed by the casefolded,
+# whitespace-collapsed address.
+_GEOCODE_TTL_SECONDS = 86400.0
+_GEOCODE_CACHE_SIZE = 4096
+
+
+@dataclass(frozen=True, slots=True)
+class _GeocodedPoint:
+    """Compact in-memory cache entry for a successful geocoding result.
+
+    Thousands of cached results are kept alive at once; a slotted instance is
+    much smaller than the result dict, which is rebuilt on each hit.
+    """
+
+    lat: float
+    lon: float
+    coordinates: str
+
+    @classmethod
+    def from_result(cls, result: dict[str, Any]) -> _GeocodedPoint:
+        return cls(result["lat"], result["lon"], result["coordinates"])
+
+    def as_result(self) -> dict[str, Any]:
+        return {
+            "status": "success",
+            "lat": self.lat,
+            "lon": self.lon,
+            "coordinates": self.coordinates,
+        }
+
+
+_geocode_cache: TTLCache[str, _GeocodedPoint] = TTLCache(
+    maxsize=_GEOCODE_CACHE_SIZE, ttl=_GEOCODE_TTL_SECONDS
+)
+# Lookups currently running, keyed like ``_geocode_cache`` (single-flight).
+_geocode_inflight: dict[str, asyncio.Future[dict[str, Any]]] = {}
+
+# Second level below the in-memory cache, shared by every process using the same
+# ``var/`` directory and kept across restarts. Keys carry a version prefix so a
+# change in the stored result shape just means bumping it.
+_GEOCODE_DISK_CACHE_DIR = Path(__file__).resolve().parents[3] / "var" / "cache" / "geocode"
+_GEOCODE_DISK_TTL_SECONDS = 7 * 86400
+_GEOCODE_DISK_KEY_PREFIX = "geocode:v2:"
+
+_geocode_disk_cache: Any = None
+_geocode_disk_cache_disabled = diskcache is None
+# The disk cache is opened and used from worker threads (it does blocking file and
+# SQLite I/O), so the lazy open is guarded.
+_geocode_disk_cache_lock = threading.Lock()
+
+# Routes between popular endpoints repeat across users; live traffic keeps them
+# valid only briefly. Keyed by the (origin, destination) coordinates.
+_ROUTE_TTL_SECONDS = 90.0
+_ROUTE_CACHE_SIZE = 1024
+
+_route_cache: TTLCache[tuple[str, str], dict[str, Any]] = TTLCache(
+    maxsize=_ROUTE_CACHE_SIZE, ttl=_ROUTE_TTL_SECONDS
+)
+# Origin and destination closer than ~50 m (0.00045°) are treated as the same
+# place and answered without calling the routing API.
+_SAME_PLACE_MAX_DEGREES_SQUARED = 2e-7
+_SAME_PLACE_ROUTE: dict[str, Any] = {
+    "status": "success",
+    "minutes_total": 0,
+    "minutes_delay": 0,
+    "distance_km": 0.0,
+    "traffic_detected": False,
+    "arrival_time_iso": None,
+    "summary_text": "El origen y el destino son el mismo lugar.",
+}
+
+# Route requests currently running, keyed like ``_route_cache`` (single-flight).
+_route_inflight: dict[tuple[str, str], asyncio.Future[dict[str, Any]]] = {}
+
+# Geocoding requests issued within a short window (e.g. a route's origin and
+# destination) are sent to TomTom as one synchronous batch search.
+_GEOCODE_BATCH_WINDOW_SECONDS = 0.02
+_GEOCODE_BATCH_MAX_ITEMS = 10
+
+# "Gas station near me" is asked repeatedly from almost the same spot. Nearby
+# searches are cached on a ~55 m grid (at Bogotá's latitude) with the radius
+# bucketed to 500 m.
+_NEARBY_GRID_STEP_DEGREES = 0.0005
+_NEARBY_RADIUS_BUCKET_METERS = 500
+_NEARBY_TTL_SECONDS = 600.0
+_NEARBY_CACHE_SIZE = 4096
+
+# The bot only serves Colombia (San Andrés included): coordinates outside this box,
+# such as a made-up (0, 0), are rejected before any request is made. Radii above
+# the cap are clamped to it.
+_COLOMBIA_LAT_RANGE = (-4.5, 13.5)
+_COLOMBIA_LON_RANGE = (-82.0, -66.0)
+_MAX_RADIUS_METERS = 50_000
+# Addresses and place types are short; longer input is not worth a request.
+_MAX_QUERY_LENGTH = 256
+
+_nearby_cache: TTLCache[tuple[int, int, str, int], list[dict[str, Any]]] = TTLCache(
+    maxsize=_NEARBY_CACHE_SIZE, ttl=_NEARBY_TTL_SECONDS
+)
+
+# Outbound TomTom traffic is capped per process so a burst of users cannot run
+# into the API's rate limits: at most this many requests in flight, started no
+# faster than this rate. Only used on the service loop.
+_MAX_CONCURRENT_REQUESTS = 16
+_MAX_REQUESTS_PER_SECOND = 50.0
+
+
+class _RateLimiter:
+    """Space request starts evenly so no more than ``rate`` begin per second."""
+
+    def __init__(self, rate: float) -> None:
+        self._interval = 1.0 / rate
+        self._next_slot = 0.0
+
+    async def wait(self) -> None:
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self._interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+_request_slots = asyncio.Semaphore(_MAX_CONCURRENT_REQUESTS)
+_rate_limiter = _RateLimiter(_MAX_REQUESTS_PER_SECOND)
 
 
 def _error_response(error_type: str, message: str, details: str | None = None) -> dict[str, Any]:
@@ -39,44 +196,153 @@ def _error_response(error_type: str, message: str, details: str | None = None) -
     return result
 
 
+# Errors whose message never varies are built once. Callers get a ``dict`` copy:
+# results are handed to the agent framework, which requires a real dict, and
+# some callers add keys to them.
+_ERR_NO_API_KEY: Final = MappingProxyType(
+    _error_response("configuration", "La API key de TomTom no está configurada en el servidor.")
+)
+_ERR_OUTSIDE_COLOMBIA: Final = MappingProxyType(
+    _error_response(
+        "validation", "Las coordenadas indicadas no corresponden a una ubicación en Colombia."
+    )
+)
+_ERR_NON_POSITIVE_RADIUS: Final = MappingProxyType(
+    _error_response("validation", "El radio de búsqueda debe ser mayor que cero.")
+)
+_ERR_ADDRESS_NOT_FOUND: Final = MappingProxyType(
+    _error_response("not_found", "No encontré una ubicación para esa dirección.")
+)
+_ERR_ROUTE_NOT_FOUND: Final = MappingProxyType(
+    _error_response("not_found", "No se encontró una ruta entre los puntos indicados.")
+)
+
+
+def _decode_json(response: httpx.Response) -> Any:
+    """Decode a JSON response body; raises ``ValueError`` on malformed JSON."""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+
 def _validate_string(value: str, field_name: str) -> dict[str, Any] | None:
-    """Validate that a string is not empty."""
-    if not value or not value.strip():
+    """Validate that a string is a plausible search text.
+
+    Empty or overly long text, pasted links and text without a single letter or
+    digit are rejected before spending a TomTom request (and a cache entry) on them.
+    """
+    stripped = value.strip() if value else ""
+    if not stripped:
         return _error_response("validation", f"Debes indicar {field_name}.")
+    if len(stripped) > _MAX_QUERY_LENGTH:
+        return _error_response("validation", f"El texto de {field_name} es demasiado largo.")
+    if stripped.casefold().startswith(("http://", "https://")) or not any(
+        char.isalnum() for char in stripped
+    ):
+        return _error_response("validation", f"Debes indicar {field_name} como texto.")
+    return None
+
+
+def _validate_search_area(lat: float, lon: float, radius_meters: int) -> dict[str, Any] | None:
+    """Validate that a nearby search is centered in Colombia with a positive radius."""
+    min_lat, max_lat = _COLOMBIA_LAT_RANGE
+    min_lon, max_lon = _COLOMBIA_LON_RANGE
+    if not (min_lat <= lat <= max_lat and min_lon <= lon <= max_lon):
+        return dict(_ERR_OUTSIDE_COLOMBIA)
+    if radius_meters <= 0:
+        return dict(_ERR_NON_POSITIVE_RADIUS)
     return None
 
 
 def _get_api_key() -> tuple[str | None, dict[str, Any] | None]:
-    """Get TomTom API key from settings, or return error if not configured."""
-    settings = get_settings()
-    api_key = getattr(settings, "tomtom_api_key", None)
-    if not api_key:
-        logger.error("TomTom API key is not configured")
-        return None, _error_response(
-            "configuration", "La API key de TomTom no está configurada en el servidor."
-        )
-    return api_key, None
+    """Get TomTom API key from settings, or return error if not configured.
+
+    The key cannot change after startup, so it is resolved once and reused.
+    """
+    global _api_key
+    if _api_key is None:
+        api_key = getattr(get_settings(), "tomtom_api_key", None)
+        if not api_key:
+            logger.error("TomTom API key is not configured")
+            return None, dict(_ERR_NO_API_KEY)
+        _api_key = api_key
+    return _api_key, None
 
 
 async def _make_request(
     url: str,
     params: dict[str, Any],
     context: dict[str, Any],
+    *,
+    json_body: dict[str, Any] | None = None,
 ) -> dict[str, Any]:
-    """Make an HTTP GET request and handle errors consistently."""
+    """Make an HTTP request (GET, or POST when ``json_body`` is given) and handle errors.
+
+    Requests wait for a concurrency slot and for the rate limiter before starting.
+    """
     try:
-        async with httpx.AsyncClient(timeout=_DEFAULT_TIMEOUT_SECONDS) as client:
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            return {"status": "success", "response": response}
+        async with _request_slots:
+            await _rate_limiter.wait()
+            client = get_http_client()
+            if json_body is None:
+                response = await client.get(url, params=params)
+            else:
+                response = await client.post(url, params=params, json=json_body)
     except httpx.RequestError as exc:
         logger.exception("Network error", extra=context)
         return _error_response("network", "No fue posible comunicarse con el servicio.", str(exc))
-    except httpx.HTTPStatusError as exc:
-        logger.exception("HTTP error", extra={**context, "status_code": exc.response.status_code})
-        return _error_response("http", "El servicio respondió con un error.", str(exc))
+
+    # Checked directly instead of raising and catching HTTPStatusError. The details
+    # carry only the status: the request URL would include the API key.
+    if not response.is_success:
+        logger.error("HTTP error", extra={**context, "status_code": response.status_code})
+        return _error_response(
+            "http", "El servicio respondió con un error.", f"HTTP {response.status_code}"
+        )
+    return {"status": "success", "response": response}
+
+
+def _address_key(address: str) -> str:
+    return " ".join(address.casefold().split())
+
+
+def _get_geocode_disk_cache() -> Any:
+    """Open the persistent geocode cache on first use; ``None`` if unavailable."""
+    global _geocode_disk_cache, _geocode_disk_cache_disabled
+    if _geocode_disk_cache is not None or _geocode_disk_cache_disabled:
+        return _geocode_disk_cache
+    with _geocode_disk_cache_lock:
+        if _geocode_disk_cache is None and not _geocode_disk_cache_disabled:
+            try:
+                _geocode_disk_cache = diskcache.Cache(str(_GEOCODE_DISK_CACHE_DIR))
+            except Exception:  # noqa: BLE001
+                logger.exception("Could not open the geocode disk cache; continuing without it")
+                _geocode_disk_cache_disabled = True
+    return _geocode_disk_cache
+
+
+def _disk_cache_get(key: str) -> dict[str, Any] | None:
+    cache = _get_geocode_disk_cache()
+    if cache is None:
+        return None
+    try:
+        return cache.get(_GEOCODE_DISK_KEY_PREFIX + key)
+    except Exception:  # noqa: BLE001
+        logger.warning("Geocode disk cache read failed", exc_info=True)
+        return None
+
+
+def _disk_cache_set(key: str, result: dict[str, Any]) -> None:
+    cache = _get_geocode_disk_cache()
+    if cache is None:
+        return
+    try:
+        cache.set(_GEOCODE_DISK_KEY_PREFIX + key, result, expire=_GEOCODE_DISK_TTL_SECONDS)
+    except Exception:  # noqa: BLE001
+        logger.warning("Geocode disk cache write failed", exc_info=True)
 
 
+@on_service_loop
 async def _geocode_address(address: str) -> dict[str, Any]:
     """Resolve a free‑text address into latitude/longitude using TomTom Search API.
 
@@ -84,15 +350,140 @@ async def _geocode_address(address: str) -> dict[str, Any]:
     - status: "success" | "error"
     - On success: lat, lon, coordinates
     - On error: error_type, message, details (optional)
+
+    Successful results are cached in memory for ``_GEOCODE_TTL_SECONDS`` and,
+    when ``diskcache`` is installed, on disk for ``_GEOCODE_DISK_TTL_SECONDS`` (read
+    and written in a worker thread, off the service loop).
+    Concurrent lookups of the same address share one request. Runs on the service loop so
+    the cache and in-flight futures are shared by every agent turn.
     """
     if validation_error := _validate_string(address, "la dirección"):
         return validation_error
 
+    key = _address_key(address)
+    cached = _geocode_cache.get(key)
+    if cached is not None:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Serving cached geocoding result", extra={"address": key})
+        return cached.as_result()
+
+    stored = await asyncio.to_thread(_disk_cache_get, key)
+    if stored is not None:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Serving geocoding result from disk cache", extra={"address": key})
+        _geocode_cache[key] = _GeocodedPoint.from_result(stored)
+        return dict(stored)
+
+    inflight = _geocode_inflight.get(key)
+    if inflight is not None:
+        try:
+            return dict(await asyncio.shield(inflight))
+        except InflightAbandoned:
+            # The caller running the lookup was cancelled; run it for this one.
+            return await _geocode_address(address)
+
+    future: asyncio.Future[dict[str, Any]] = asyncio.get_running_loop().create_future()
+    _geocode_inflight[key] = future
+    try:
+        result = await _geocode_batcher.geocode(address.strip())
+    except BaseException as exc:
+        fail_inflight(future, exc)
+        raise
+    finally:
+        del _geocode_inflight[key]
+
+    success = result.get("status") == "success"
+    if success:
+        _geocode_cache[key] = _GeocodedPoint.from_result(result)
+    future.set_result(result)
+    if success:
+        await asyncio.to_thread(_disk_cache_set, key, result)
+    return dict(result)
+
+
+class _GeocodeBatcher:
+    """Coalesce geocoding requests made within a short window into one batch call.
+
+    Lives on the service loop, like the geocoding cache in front of it.
+    """
+
+    def __init__(self) -> None:
+        self._pending: list[tuple[str, asyncio.Future[dict[str, Any]]]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def geocode(self, query: str) -> dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[dict[str, Any]] = loop.create_future()
+        self._pending.append((query, future))
+        if len(self._pending) >= _GEOCODE_BATCH_MAX_ITEMS:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(_GEOCODE_BATCH_WINDOW_SECONDS, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: list[tuple[str, asyncio.Future[dict[str, Any]]]]) -> None:
+        queries = [query for query, _ in batch]
+        try:
+            if len(queries) == 1:
+                results = [await _request_geocode(queries[0])]
+            else:
+                results = await _request_geocode_batch(queries)
+        except Exception as exc:  # noqa: BLE001
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+_geocode_batcher = _GeocodeBatcher()
+
+
+def _parse_geocode_data(data: dict[str, Any], query: str) -> dict[str, Any]:
+    """Extract the first match's coordinates from a TomTom search response."""
+    results = data.get("results") or []
+    if not results:
+        logger.info("No geocoding results found", extra={"address": query})
+        return dict(_ERR_ADDRESS_NOT_FOUND)
+
+    position = results[0].get("position") or {}
+    lat = position.get("lat")
+    lon = position.get("lon")
+
+    if lat is None or lon is None:
+        logger.warning("Missing position field", extra={"address": query})
+        return _error_response("parse", "La respuesta no contenía coordenadas válidas.")
+
+    # Six decimals (~11 cm) is all TomTom uses. The fixed width keeps routing URLs
+    # short and makes near-identical geocodes share one route cache key.
+    coordinates = f"{lat:.6f},{lon:.6f}"
+    # Success paths only build the ``extra`` dict when the record will be emitted;
+    # error paths are cold and log unconditionally.
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Resolved address", extra={"address": query, "lat": lat, "lon": lon})
+
+    return {"status": "success", "lat": lat, "lon": lon, "coordinates": coordinates}
+
+
+async def _request_geocode(query: str) -> dict[str, Any]:
+    """Call the TomTom Search API for a single address (no caching)."""
     api_key, key_error = _get_api_key()
     if key_error:
         return key_error
 
-    query = address.strip()
     encoded_query = quote(query, safe="")
     url = f"{_SEARCH_BASE_URL}/{encoded_query}.json"
     params = {"key": api_key, "limit": 1}
@@ -103,35 +494,68 @@ async def _geocode_address(address: str) -> dict[str, Any]:
 
     response = request_result["response"]
     try:
-        data = response.json()
+        data = _decode_json(response)
     except ValueError as exc:
         logger.exception("Failed to decode response", extra={"address": query})
         return _error_response("parse", "No se pudo interpretar la respuesta.", str(exc))
 
-    results = data.get("results") or []
-    if not results:
-        logger.info("No geocoding results found", extra={"address": query})
-        return _error_response("not_found", "No encontré una ubicación para esa dirección.")
+    return _parse_geocode_data(data, query)
 
-    position = results[0].get("position") or {}
-    lat = position.get("lat")
-    lon = position.get("lon")
 
-    if lat is None or lon is None:
-        logger.warning("Missing position field", extra={"address": query})
-        return _error_response("parse", "La respuesta no contenía coordenadas válidas.")
+async def _request_geocode_batch(queries: list[str]) -> list[dict[str, Any]]:
+    """Geocode several addresses with one TomTom batch search call (no caching).
 
-    coordinates = f"{lat},{lon}"
-    logger.info("Resolved address", extra={"address": query, "lat": lat, "lon": lon})
+    Returns one result per query, in order. A failure of the whole call is
+    reported for every query.
+    """
+    api_key, key_error = _get_api_key()
+    if key_error:
+        return [key_error] * len(queries)
 
-    return {"status": "success", "lat": lat, "lon": lon, "coordinates": coordinates}
+    body = {
+        "batchItems": [
+            {"query": f"/search/{quote(query, safe='')}.json?limit=1"} for query in queries
+        ]
+    }
+    request_result = await _make_request(
+        _BATCH_SEARCH_URL, {"key": api_key}, {"batch_size": len(queries)}, json_body=body
+    )
+    if request_result.get("status") != "success":
+        return [request_result] * len(queries)
+
+    try:
+        items = _decode_json(request_result["response"]).get("batchItems") or []
+    except ValueError as exc:
+        logger.exception("Failed to decode batch response", extra={"batch_size": len(queries)})
+        error = _error_response("parse", "No se pudo interpretar la respuesta.", str(exc))
+        return [error] * len(queries)
+
+    if len(items) != len(queries):
+        logger.warning(
+            "Batch response size mismatch",
+            extra={"batch_size": len(queries), "items": len(items)},
+        )
+        error = _error_response("parse", "La respuesta del servicio estaba incompleta.")
+        return [error] * len(queries)
+
+    results: list[dict[str, Any]] = []
+    for query, item in zip(queries, items):
+        if item.get("statusCode") != 200:
+            logger.warning(
+                "Batch item failed",
+                extra={"address": query, "status_code": item.get("statusCode")},
+            )
+            results.append(_error_response("http", "El servicio respondió con un error."))
+        else:
+            results.append(_parse_geocode_data(item.get("response") or {}, query))
+    return results
 
 
 def _parse_route_data(data: dict[str, Any]) -> dict[str, Any]:
     """Parse route data from TomTom API response into summary metrics."""
     routes = data.get("routes") or []
     if not routes:
-        return _error_response("not_found", "No se encontró una ruta entre los puntos indicados.")
+        return dict(_ERR_ROUTE_NOT_FOUND)
 
     summary = routes[0].get("summary") or {}
     try:
@@ -167,6 +591,81 @@ def _parse_route_data(data: dict[str, Any]) -> dict[str, Any]:
     }
 
 
+def _is_same_place(origin_geo: dict[str, Any], dest_geo: dict[str, Any]) -> bool:
+    d_lat = origin_geo["lat"] - dest_geo["lat"]
+    d_lon = origin_geo["lon"] - dest_geo["lon"]
+    return d_lat * d_lat + d_lon * d_lon < _SAME_PLACE_MAX_DEGREES_SQUARED
+
+
+@on_service_loop
+async def _route_between(origin_coords: str, dest_coords: str) -> dict[str, Any]:
+    """Return route metrics between two coordinates, cached for ``_ROUTE_TTL_SECONDS``.
+
+    Addresses are geocoded (and cached) first, so popular origin/destination
+    pairs written differently still land on the same coordinates key. Concurrent
+    requests for the same pair share one TomTom call.
+    """
+    key = (origin_coords, dest_coords)
+    cached = _route_cache.get(key)
+    if cached is not None:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Serving cached route", extra={"origin": origin_coords, "destination": dest_coords}
+            )
+        return dict(cached)
+
+    inflight = _route_inflight.get(key)
+    if inflight is not None:
+        try:
+            return dict(await asyncio.shield(inflight))
+        except InflightAbandoned:
+            # The caller running the request was cancelled; run it for this one.
+            return await _route_between(origin_coords, dest_coords)
+
+    future: asyncio.Future[dict[str, Any]] = asyncio.get_running_loop().create_future()
+    _route_inflight[key] = future
+    try:
+        route_data = await _request_route(origin_coords, dest_coords)
+    except BaseException as exc:
+        fail_inflight(future, exc)
+        raise
+    finally:
+        del _route_inflight[key]
+
+    if route_data.get("status") == "success":
+        _route_cache[key] = route_data
+    future.set_result(route_data)
+    return dict(route_data)
+
+
+async def _request_route(origin_coords: str, dest_coords: str) -> dict[str, Any]:
+    """Call the TomTom routing API with live traffic (no caching)."""
+    api_key, key_error = _get_api_key()
+    if key_error:
+        return key_error
+
+    route_url = f"{_ROUTING_BASE_URL}/{origin_coords}:{dest_coords}/json"
+    params = {"key": api_key, **_ROUTE_PARAMS}
+
+    request_result = await _make_request(
+        route_url, params, {"origin": origin_coords, "destination": dest_coords}
+    )
+    if request_result.get("status") != "success":
+        return request_result
+
+    response = request_result["response"]
+    try:
+        data = _decode_json(response)
+    except ValueError as exc:
+        logger.exception(
+            "Failed to decode response",
+            extra={"origin": origin_coords, "destination": dest_coords},
+        )
+        return _error_response("parse", "No se pudo interpretar la respuesta.", str(exc))
+
+    return _parse_route_data(data)
+
+
 async def get_route_traffic_summary(
     origin_text: str,
     destination_text: str,
@@ -181,14 +680,16 @@ async def get_route_traffic_summary(
     if validation_error := _validate_string(destination_text, "la dirección de destino"):
         return validation_error
 
-    origin_geo = await _geocode_address(origin_text)
+    # Resolved concurrently so both lookups can share one batch request.
+    origin_geo, dest_geo = await asyncio.gather(
+        _geocode_address(origin_text), _geocode_address(destination_text)
+    )
     if origin_geo.get("status") != "success":
         return _error_response(
             origin_geo.get("error_type", "geocoding"),
             f"No pude localizar la dirección de origen: {origin_text}",
         )
 
-    dest_geo = await _geocode_address(destination_text)
     if dest_geo.get("status") != "success":
         return _error_response(
             dest_geo.get("error_type", "geocoding"),
@@ -198,43 +699,26 @@ async def get_route_traffic_summary(
     origin_coords = origin_geo["coordinates"]
     dest_coords = dest_geo["coordinates"]
 
-    api_key, key_error = _get_api_key()
-    if key_error:
-        return key_error
-
-    route_url = f"{_ROUTING_BASE_URL}/{origin_coords}:{dest_coords}/json"
-    params = {"key": api_key, "traffic": "true", "travelMode": "car", "routeType": "fastest"}
-
-    request_result = await _make_request(
-        route_url, params, {"origin": origin_coords, "destination": dest_coords}
-    )
-    if request_result.get("status") != "success":
-        return request_result
-
-    response = request_result["response"]
-    try:
-        data = response.json()
-    except ValueError as exc:
-        logger.exception(
-            "Failed to decode response",
-            extra={"origin": origin_coords, "destination": dest_coords},
+    same_place = _is_same_place(origin_geo, dest_geo)
+    if same_place:
+        # Nothing to route; a frequent slip is sending the same place twice.
+        route_data = dict(_SAME_PLACE_ROUTE)
+    else:
+        route_data = await _route_between(origin_coords, dest_coords)
+        if route_data.get("status") != "success":
+            return route_data
+
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "Computed route summary",
+            extra={
+                "origin": origin_text,
+                "destination": destination_text,
+                "minutes_total": route_data["minutes_total"],
+                "minutes_delay": route_data["minutes_delay"],
+                "distance_km": route_data["distance_km"],
+            },
         )
-        return _error_response("parse", "No se pudo interpretar la respuesta.", str(exc))
-
-    route_data = _parse_route_data(data)
-    if route_data.get("status") != "success":
-        return route_data
-
-    logger.info(
-        "Computed route summary",
-        extra={
-            "origin": origin_text,
-            "destination": destination_text,
-            "minutes_total": route_data["minutes_total"],
-            "minutes_delay": route_data["minutes_delay"],
-            "distance_km": route_data["distance_km"],
-        },
-    )
 
     result = {
         **route_data,
@@ -245,52 +729,74 @@ async def get_route_traffic_summary(
     }
 
     # Texto listo para mostrar al usuario. El agente puede reutilizarlo directamente.
-    result["user_friendly_summary"] = (
-        f"Entre '{origin_text}' y '{destination_text}' la ruta es de "
-        f"{route_data['distance_km']} km y toma aproximadamente "
-        f"{route_data['minutes_total']} minutos"
-        f"{' (incluye tráfico)' if route_data['traffic_detected'] else ''}."
-    )
+    if same_place:
+        result["user_friendly_summary"] = (
+            f"'{origin_text}' y '{destination_text}' son prácticamente el mismo lugar, "
+            "así que no hay trayecto que calcular."
+        )
+    else:
+        result["user_friendly_summary"] = (
+            f"Entre '{origin_text}' y '{destination_text}' la ruta es de "
+            f"{route_data['distance_km']} km y toma aproximadamente "
+            f"{route_data['minutes_total']} minutos"
+            f"{' (incluye tráfico)' if route_data['traffic_detected'] else ''}."
+        )
 
     return result
 
 
-async def find_nearby_services(
-    lat: float,
-    lon: float,
-    query: str = "gas station",
-    radius_meters: int = 2000,
-) -> dict[str, Any]:
-    """Busca servicios cercanos alrededor de una ubicación.
+def _nearby_key(
+    lat: float, lon: float, query: str, radius_meters: int
+) -> tuple[int, int, str, int]:
+    """Quantize a nearby search so requests a few meters apart share a cache entry."""
+    return (
+        round(lat / _NEARBY_GRID_STEP_DEGREES),
+        round(lon / _NEARBY_GRID_STEP_DEGREES),
+        " ".join(query.casefold().split()),
+        radius_meters // _NEARBY_RADIUS_BUCKET_METERS,
+    )
 
-    Args:
-        lat: Latitud del centro de búsqueda.
-        lon: Longitud del centro de búsqueda.
-        query: Término de búsqueda (ej: "gas station", "parking", "mechanic", "atm").
-        radius_meters: Radio de búsqueda en metros (default 2km).
 
-    Returns:
-        Respuesta estándar con:
-        - status: "success" | "error"
-        - En success: lista de lugares encontrados bajo la clave "places".
+@on_service_loop
+async def _search_places(lat: float, lon: float, query: str, radius_meters: int) -> dict[str, Any]:
+    """Return the POIs around a point, serving repeated nearby searches from cache.
+
+    Runs on the service loop so the cache is shared by every agent turn. Callers
+    get their own copy of the places list.
     """
+    key = _nearby_key(lat, lon, query, radius_meters)
+    cached = _nearby_cache.get(key)
+    if cached is not None:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Serving cached nearby search", extra={"query": query, "lat": lat, "lon": lon}
+            )
+        return {"status": "success", "places": [dict(place) for place in cached]}
+
+    result = await _request_places(lat, lon, query, radius_meters)
+    if result.get("status") == "success":
+        _nearby_cache[key] = [dict(place) for place in result["places"]]
+    return result
+
+
+async def _request_places(lat: float, lon: float, query: str, radius_meters: int) -> dict[str, Any]:
+    """Call the TomTom POI search around a point (no caching)."""
 
     api_key, key_error = _get_api_key()
     if key_error:
         return key_error
 
-    # URL específica para búsqueda de POIs
+    # Misma URL de búsqueda que la geocodificación; ``idxSet=POI`` la restringe a POIs.
     # Encodeamos el query para evitar errores con espacios
     encoded_query = quote(query, safe="")
-    url = f"{_POI_SEARCH_BASE_URL}/{encoded_query}.json"
+    url = f"{_SEARCH_BASE_URL}/{encoded_query}.json"
 
     params = {
         "key": api_key,
         "lat": lat,
         "lon": lon,
         "radius": radius_meters,
-        "limit": 5,  # Traemos solo los 5 más cercanos para no saturar al usuario
-        "idxSet": "POI",  # Importante: Solo buscar Puntos de Interés, no direcciones
+        **_POI_SEARCH_PARAMS,
     }
 
     request_result = await _make_request(
@@ -305,7 +811,7 @@ async def find_nearby_services(
     response = request_result["response"]
 
     try:
-        data = response.json()
+        data = _decode_json(response)
     except ValueError as exc:
         logger.exception("Failed to decode POI response")
         return _error_response(
@@ -316,17 +822,6 @@ async def find_nearby_services(
 
     results = data.get("results") or []
 
-    if not results:
-        return {
-            "status": "success",
-            "message": f"No encontré '{query}' en un radio de {radius_meters}m.",
-            "places": [],
-            "summary_text": (
-                f"No encontré lugares de tipo '{query}' cerca de las coordenadas "
-                f"({lat}, {lon}) en un radio de {radius_meters} metros."
-            ),
-        }
-
     # Procesamos los resultados para devolver solo lo útil al agente
     places: list[dict[str, Any]] = []
     for item in results:
@@ -346,33 +841,87 @@ async def find_nearby_services(
         }
         places.append(place_info)
 
-    logger.info(
-        "Found nearby services",
-        extra={
-            "query": query,
-            "lat": lat,
-            "lon": lon,
-            "radius_meters": radius_meters,
-            "count": len(places),
-        },
-    )
+    return {"status": "success", "places": places}
 
-    # Construimos un resumen textual amigable para que el agente lo pueda usar tal cual.
-    max_listed = min(len(places), 5)
-    places_lines = []
-    for idx, place in enumerate(places[:max_listed], start=1):
-        places_lines.append(
-            f"{idx}. {place['name']} – {place['address']} "
-            f"({place['distance_text']})"
+
+async def find_nearby_services(
+    lat: float,
+    lon: float,
+    query: str = "gas station",
+    radius_meters: int = 2000,
+) -> dict[str, Any]:
+    """Busca servicios cercanos alrededor de una ubicación.
+
+    Args:
+        lat: Latitud del centro de búsqueda.
+        lon: Longitud del centro de búsqueda.
+        query: Término de búsqueda (ej: "gas station", "parking", "mechanic", "atm").
+        radius_meters: Radio de búsqueda en metros (default 2km).
+
+    Returns:
+        Respuesta estándar con:
+        - status: "success" | "error"
+        - En success: lista de lugares encontrados bajo la clave "places".
+
+    Coordenadas fuera de Colombia o un radio no positivo se rechazan sin llamar a
+    TomTom; radios mayores a ``_MAX_RADIUS_METERS`` se recortan a ese valor.
+
+    Búsquedas repetidas a pocos metros (misma consulta y radio similar) se
+    responden desde caché durante ``_NEARBY_TTL_SECONDS``.
+    """
+
+    if validation_error := _validate_string(query, "qué tipo de lugar buscar"):
+        return validation_error
+
+    if validation_error := _validate_search_area(lat, lon, radius_meters):
+        return validation_error
+
+    radius_meters = min(radius_meters, _MAX_RADIUS_METERS)
+
+    search_result = await _search_places(lat, lon, query, radius_meters)
+    if search_result.get("status") != "success":
+        return search_result
+
+    places: list[dict[str, Any]] = search_result["places"]
+
+    if not places:
+        return {
+            "status": "success",
+            "message": f"No encontré '{query}' en un radio de {radius_meters}m.",
+            "places": [],
+            "summary_text": (
+                f"No encontré lugares de tipo '{query}' cerca de las coordenadas "
+                f"({lat}, {lon}) en un radio de {radius_meters} metros."
+            ),
+        }
+
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "Found nearby services",
+            extra={
+                "query": query,
+                "lat": lat,
+                "lon": lon,
+                "radius_meters": radius_meters,
+                "count": len(places),
+            },
         )
 
+    # Construimos un resumen textual amigable para que el agente lo pueda usar tal cual.
+    # ``places`` is non-empty here, so the header is always followed by a list.
     summary_header = (
         f"Encontré {len(places)} lugar(es) de tipo '{query}' "
         f"en un radio de {radius_meters} metros."
     )
-    summary_text = summary_header
-    if places_lines:
-        summary_text += "\n" + "\n".join(places_lines)
+    summary_text = "\n".join(
+        [
+            summary_header,
+            *(
+                f"{idx}. {place['name']} – {place['address']} ({place['distance_text']})"
+                for idx, place in enumerate(places[:5], start=1)
+            ),
+        ]
+    )
 
     return {
         "status": "success",
@@ -411,6 +960,14 @@ async def find_nearby_services_by_address(
     delega en ``find_nearby_services``.
     """
 
+    if validation_error := _validate_string(query, "qué tipo de lugar buscar"):
+        return validation_error
+
+    if radius_meters <= 0:
+        return dict(_ERR_NON_POSITIVE_RADIUS)
+
+    radius_meters = min(radius_meters, _MAX_RADIUS_METERS)
+
     geo = await _geocode_address(address_text)
     if geo.get("status") != "success":
         return _error_response(
@@ -3,6 +3,7 @@ from __future__ import annotations
 import logging
 
 from telegram.ext import (
+    AIORateLimiter,
     Application,
     ApplicationBuilder,
     CommandHandler,
@@ -11,6 +12,8 @@ from telegram.ext import (
 )
 
 from app.config import get_settings
+from app.db.writer import log_writer
+from app.services import close_http_client, close_simit_browser, warm_up_simit_browser
 from app.telegram.handlers import (
     handle_contact,
     handle_error,
@@ -21,6 +24,26 @@ from app.telegram.handlers import (
 
 logger = logging.getLogger(__name__)
 
+# Calls rejected by Telegram's flood control are retried after the ``retry_after``
+# it returns, up to this many times, instead of being dropped.
+_MAX_FLOOD_RETRIES = 3
+# Connections kept for Bot API calls made from handlers (getUpdates has its own).
+_BOT_API_POOL_SIZE = 32
+
+
+async def _start_services(application: Application) -> None:
+    """Warm up service-layer resources in the background so startup is not delayed."""
+
+    application.create_task(warm_up_simit_browser(), name="simit-warm-up")
+
+
+async def _shutdown_services(application: Application) -> None:
+    """Release long-lived resources held by the service layer once the bot stops."""
+
+    await log_writer.close()
+    await close_simit_browser()
+    await close_http_client()
+
 
 def build_application() -> Application:
     """Configure the Telegram application with handlers and middleware."""
@@ -29,6 +52,19 @@ def build_application() -> Application:
     application = (
         ApplicationBuilder()
         .token(settings.telegram_bot_token)
+        # Process updates concurrently so one user's slow agent turn does not hold
+        # up everyone else's messages.
+        .concurrent_updates(settings.telegram_concurrent_updates)
+        # Every Bot API call (replies, status edits, chat actions) goes through one
+        # limiter that keeps under Telegram's global and per-group limits.
+        .rate_limiter(AIORateLimiter(max_retries=_MAX_FLOOD_RETRIES))
+        # Replies, status edits and chat actions from concurrent turns share
+        # multiplexed HTTP/2 connections to the Bot API instead of queueing on the
+        # small default pool.
+        .http_version("2")
+        .connection_pool_size(_BOT_API_POOL_SIZE)
+        .post_init(_start_services)
+        .post_shutdown(_shutdown_services)
         .build()
     )
 
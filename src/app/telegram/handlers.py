@@ -1,55 +1,224 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
 import logging
+from collections.abc import AsyncIterator, Coroutine
+from datetime import timedelta
+from typing import Any
 
-from telegram import KeyboardButton, ReplyKeyboardMarkup, Update
+from cachetools import TTLCache
+from telegram import Bot, KeyboardButton, ReplyKeyboardMarkup, Update, User
 from telegram.constants import ChatAction
-from telegram.error import BadRequest
+from telegram.error import BadRequest, RetryAfter
 from telegram.ext import ContextTypes
 
 from app.agents.transmi_agent.agent import invoke_agent
 from app.db.crud import (
     get_or_create_user_by_telegram_id,
     log_interaction_by_telegram_id,
+    log_interactions_by_telegram_id,
 )
 
 logger = logging.getLogger(__name__)
 
+# Background bookkeeping tasks still running; bounded so a stalled database cannot
+# make them pile up.
+_MAX_PENDING_TASKS = 1000
+_pending_tasks: set[asyncio.Task[Any]] = set()
+
+# /start y /help responden siempre lo mismo; los objetos de Telegram son inmutables,
+# así que se construyen una sola vez.
+_START_TEXT = (
+    "👋 ¡Hola! Soy *TransmiBot*, tu asistente de movilidad en Colombia.\n\n"
+    "🚗 Puedo ayudarte a:\n"
+    "• Calcular rutas con información de tráfico en tiempo real\n"
+    "• Buscar lugares cercanos (gasolineras, parqueaderos, etc.)\n"
+    "• Consultar el estado de multas en Simit por placa de vehículo\n\n"
+    "Para personalizar mejor tu experiencia, puedes compartir tu número de teléfono "
+    "tocando el botón de abajo (opcional)."
+)
+# Pedimos el número de teléfono usando el teclado de Telegram para poder usarlo como ID.
+_START_KEYBOARD = ReplyKeyboardMarkup(
+    [[KeyboardButton(text="Compartir mi teléfono 📱", request_contact=True)]],
+    resize_keyboard=True,
+    one_time_keyboard=True,
+)
+_HELP_TEXT = (
+    "ℹ️ *Comandos disponibles*\n"
+    "• /start – Mensaje de bienvenida y resumen del bot.\n"
+    "• /help – Muestra esta lista de comandos.\n\n"
+    "También puedes escribirme directamente para: calcular rutas con tráfico,"
+    " buscar lugares cercanos o consultar el estado de multas de tu vehículo en Simit."
+)
+
+# During an outage the same error is raised for every update. Its traceback is
+# logged once per window (logging's QueueHandler still formats it on the caller's
+# thread); repeats within the window get a one-line record.
+_ERROR_SAMPLE_TTL_SECONDS = 60.0
+_ERROR_SAMPLE_MAX_KEYS = 256
+_recent_errors: TTLCache[tuple[type, str], bool] = TTLCache(
+    maxsize=_ERROR_SAMPLE_MAX_KEYS, ttl=_ERROR_SAMPLE_TTL_SECONDS
+)
+
+_NO_QUERY_TEXT = (
+    "¿En qué te puedo ayudar? Puedo calcular rutas con tráfico, buscar lugares "
+    "cercanos o consultar multas en Simit."
+)
+_AGENT_ERROR_TEXT = (
+    "Lo siento, ocurrió un error al consultar al agente. Inténtalo de nuevo más tarde."
+)
+
+# Telegram rejects messages over 4096 characters; long replies are sent in pieces
+# of at most this size.
+_MESSAGE_CHUNK_LIMIT = 4000
+_CHUNK_SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+# Streamed follow-up replies are sent at most once per interval, merged, unless
+# the merged text grows past this size first.
+_FOLLOW_UP_INTERVAL_SECONDS = 1.0
+_FOLLOW_UP_MAX_BUFFERED_CHARS = 3500
+
+# Telegram shows a chat action for about five seconds; it is renewed just before.
+_TYPING_REFRESH_SECONDS = 4.0
+
+
+def _fire_and_forget(coro: Coroutine[Any, Any, Any], *, description: str) -> None:
+    """Run ``coro`` in the background, logging (not raising) its failures."""
+
+    if len(_pending_tasks) >= _MAX_PENDING_TASKS:
+        coro.close()
+        logger.warning("Too many pending background tasks; dropping %s", description)
+        return
+
+    def _on_done(task: asyncio.Task[Any]) -> None:
+        _pending_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Background %s failed", description, exc_info=task.exception())
+
+    task = asyncio.create_task(coro)
+    _pending_tasks.add(task)
+    task.add_done_callback(_on_done)
+
+
+async def _wait_for_stop(stop_event: asyncio.Event, timeout: float) -> bool:
+    """Sleep up to ``timeout`` seconds, waking early; return whether ``stop_event`` is set."""
+
+    try:
+        await asyncio.wait_for(stop_event.wait(), timeout)
+    except TimeoutError:
+        return False
+    return True
+
+
+async def _stop_background(stop_event: asyncio.Event, *tasks: asyncio.Task[Any]) -> None:
+    """Signal ``tasks`` to stop, cancel them and wait until every one has exited."""
+
+    stop_event.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class _ChatTyping:
+    """Keep one "typing…" action alive per chat while any of its turns is waiting.
+
+    Several quick messages from the same chat share a single refresh task
+    instead of each sending its own chat actions. Used only from the bot's event
+    loop, so it needs no lock.
+    """
+
+    def __init__(self) -> None:
+        self._waiting: dict[int, int] = {}
+        self._tasks: dict[int, asyncio.Task[None]] = {}
+
+    @contextlib.asynccontextmanager
+    async def active(self, chat_id: int, bot: Bot) -> AsyncIterator[None]:
+        waiting = self._waiting.get(chat_id, 0)
+        self._waiting[chat_id] = waiting + 1
+        if waiting == 0:
+            self._tasks[chat_id] = asyncio.create_task(self._keep_typing(chat_id, bot))
+        try:
+            yield
+        finally:
+            self._waiting[chat_id] -= 1
+            if self._waiting[chat_id] == 0:
+                del self._waiting[chat_id]
+                self._tasks.pop(chat_id).cancel()
+
+    @staticmethod
+    async def _keep_typing(chat_id: int, bot: Bot) -> None:
+        while True:
+            try:
+                await bot.send_chat_action(chat_id=chat_id, action=ChatAction.TYPING)
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("Error en keep_typing_action: %s", exc)
+                return
+            await asyncio.sleep(_TYPING_REFRESH_SECONDS)
+
+
+_chat_typing = _ChatTyping()
+
+
+def _profile_fields(user: User) -> dict[str, str | None]:
+    """Profile fields stored with the user row, read once per update."""
+
+    return {"username": user.username, "first_name": user.first_name, "last_name": user.last_name}
+
+
+def _retry_after_seconds(exc: RetryAfter) -> float:
+    """Seconds Telegram asked to wait (``retry_after`` is an int or a timedelta)."""
+
+    retry_after = exc.retry_after
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+def _chunk_for_telegram(text: str, limit: int = _MESSAGE_CHUNK_LIMIT) -> list[str]:
+    """Split ``text`` into messages Telegram accepts.
+
+    Cuts at the last paragraph, line, sentence or word break that fits, in that
+    order of preference, and mid-word only when there is none.
+    """
+
+    chunks: list[str] = []
+    while len(text) > limit:
+        window = text[:limit]
+        for separator in _CHUNK_SEPARATORS:
+            cut = window.rfind(separator)
+            if cut > 0:
+                cut += len(separator)
+                break
+        else:
+            cut = limit
+        if chunk := text[:cut].rstrip():
+            chunks.append(chunk)
+        text = text[cut:].lstrip()
+    if text or not chunks:
+        chunks.append(text)
+    return chunks
+
+
+def _log_user_message(telegram_id: int, message_text: str) -> None:
+    try:
+        log_interaction_by_telegram_id(telegram_id, message_text, role="user")
+    except Exception:  # noqa: BLE001
+        logger.exception("Failed to log user interaction")
+
 
 async def handle_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if update.message is None:
         logger.warning("Received /start without message: %s", update)
         return
 
-    # Pedimos el número de teléfono usando el teclado de Telegram para poder usarlo como ID.
-    contact_button = KeyboardButton(text="Compartir mi teléfono 📱", request_contact=True)
-    reply_markup = ReplyKeyboardMarkup(
-        [[contact_button]], resize_keyboard=True, one_time_keyboard=True
-    )
-
     await update.message.reply_text(
-        "👋 ¡Hola! Soy *TransmiBot*, tu asistente de movilidad en Colombia.\n\n"
-        "🚗 Puedo ayudarte a:\n"
-        "• Calcular rutas con información de tráfico en tiempo real\n"
-        "• Buscar lugares cercanos (gasolineras, parqueaderos, etc.)\n"
-        "• Consultar el estado de multas en Simit por placa de vehículo\n\n"
-        "Para personalizar mejor tu experiencia, puedes compartir tu número de teléfono "
-        "tocando el botón de abajo (opcional).",
-        parse_mode="Markdown",
-        reply_markup=reply_markup,
+        _START_TEXT, parse_mode="Markdown", reply_markup=_START_KEYBOARD
     )
 
 
 async def handle_help(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    await update.message.reply_text(
-        "ℹ️ *Comandos disponibles*\n"
-        "• /start – Mensaje de bienvenida y resumen del bot.\n"
-        "• /help – Muestra esta lista de comandos.\n\n"
-        "También puedes escribirme directamente para: calcular rutas con tráfico,"
-        " buscar lugares cercanos o consultar el estado de multas de tu vehículo en Simit.",
-        parse_mode="Markdown",
-    )
+    await update.message.reply_text(_HELP_TEXT, parse_mode="Markdown")
 
 
 async def handle_contact(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -65,13 +234,10 @@ async def handle_contact(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     if telegram_id:
         # Register/update user with phone number
         try:
-            await asyncio.to_thread(
-                get_or_create_user_by_telegram_id,
+            await get_or_create_user_by_telegram_id(
                 telegram_id,
                 phone_number=phone_number,
-                username=user.username if user else None,
-                first_name=user.first_name if user else None,
-                last_name=user.last_name if user else None,
+                **_profile_fields(user),
             )
             await update.message.reply_text(
                 "✅ ¡Gracias por compartir tu número! "
@@ -86,7 +252,13 @@ async def handle_contact(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 
 async def handle_error(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
-    logger.exception("Unhandled exception in Telegram handler", exc_info=context.error)
+    error = context.error
+    key = (type(error), str(error))
+    if key in _recent_errors:
+        logger.error("Unhandled exception in Telegram handler (repeated): %r", error)
+        return
+    _recent_errors[key] = True
+    logger.exception("Unhandled exception in Telegram handler", exc_info=error)
 
 
 async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -102,35 +274,41 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         logger.warning("Received message without telegram_id: %s", update)
         return
 
+    # El mensaje del usuario se registra junto con la primera respuesta del
+    # asistente (o solo, si el agente falla) para escribir ambos en un mismo lote.
+    message_text = update.message.text or ""
+    if not message_text.strip():
+        # Nada que preguntarle al agente.
+        return
+
     # Intentamos obtener el teléfono desde el contacto compartido o desde el contexto.
     phone_number: str | None = None
     if update.message.contact and update.message.contact.phone_number:
         phone_number = update.message.contact.phone_number
 
-    # Siempre registramos/creamos el usuario usando telegram_id
-    try:
-        await asyncio.to_thread(
-            get_or_create_user_by_telegram_id,
+    # Siempre registramos/creamos el usuario usando telegram_id, sin esperar a la BD:
+    # la respuesta al usuario no depende de ello.
+    _fire_and_forget(
+        get_or_create_user_by_telegram_id(
             telegram_id,
             phone_number=phone_number,
-            username=user.username if user else None,
-            first_name=user.first_name if user else None,
-            last_name=user.last_name if user else None,
-        )
-    except Exception:  # noqa: BLE001
-        logger.exception("Failed to upsert user")
+            **_profile_fields(user),
+        ),
+        description="user upsert",
+    )
 
-    # Registramos el mensaje del usuario
-    try:
-        message_text = update.message.text or ""
-        await asyncio.to_thread(
-            log_interaction_by_telegram_id,
-            telegram_id,
-            message_text,
-            role="user",
-        )
-    except Exception:  # noqa: BLE001
-        logger.exception("Failed to log user interaction")
+    # Mensajes sin letras ni números (solo emojis o signos) no son una consulta: se
+    # responden al instante, sin mensaje de estado ni llamada al agente.
+    if not any(char.isalnum() for char in message_text):
+        await update.message.reply_text(_NO_QUERY_TEXT)
+        try:
+            log_interactions_by_telegram_id(
+                telegram_id,
+                [(message_text, "user"), (_NO_QUERY_TEXT, "assistant")],
+            )
+        except Exception:  # noqa: BLE001
+            logger.exception("Failed to log user message and canned reply")
+        return
 
     status_message = await update.message.reply_text("Procesando ⏳")
 
@@ -138,137 +316,160 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
 
     async def animate_status_message() -> None:
         # Small delay before starting animation to avoid immediate edit after creation
-        await asyncio.sleep(0.5)
-        
+        if await _wait_for_stop(stop_event, 0.5):
+            return
+
         animation_frames = ["⏳", "⌛"]
         frame_index = 1  # Start at 1 since we already showed ⏳
         last_text = "Procesando ⏳"
 
         while not stop_event.is_set():
+            # Slightly longer delay to reduce edit frequency
+            delay = 1.5
+            new_text = f"Procesando {animation_frames[frame_index]}"
+            frame_index = (frame_index + 1) % len(animation_frames)
             try:
-                new_text = f"Procesando {animation_frames[frame_index]}"
                 # Only edit if text actually changed to avoid 400 errors
                 if new_text != last_text:
                     await status_message.edit_text(new_text)
                     last_text = new_text
-                frame_index = (frame_index + 1) % len(animation_frames)
-                await asyncio.sleep(1.5)  # Slightly longer delay to reduce edit frequency
+            except RetryAfter as exc:
+                # Flood control: wait as long as Telegram asks, not a fixed second.
+                delay = max(delay, _retry_after_seconds(exc))
             except BadRequest as exc:
+                # "Message is not modified" and other 400s on an edit are harmless: the
+                # message might have been edited elsewhere or is unchanged. Move on to
+                # the next frame without any extra delay.
                 error_str = str(exc).lower()
-                # Telegram returns 400 for "message is not modified" or other edit failures
-                if "message is not modified" in error_str or "bad request" in error_str:
-                    # Silently continue - message might have been edited elsewhere or is unchanged
-                    await asyncio.sleep(1)  # Wait before next attempt
-                else:
+                if "message is not modified" not in error_str and "bad request" not in error_str:
                     logger.debug("Error animando mensaje (non-critical): %s", exc)
-                    await asyncio.sleep(1)
             except Exception as exc:  # noqa: BLE001
                 # Log but don't stop - let stop_event handle termination
                 logger.debug("Error inesperado en animate_message (non-critical): %s", exc)
-                await asyncio.sleep(1)  # Wait before retrying to avoid tight loop
-
-    async def send_typing_action() -> None:
-        while not stop_event.is_set():
-            try:
-                await context.bot.send_chat_action(chat_id=chat_id, action=ChatAction.TYPING)
-                await asyncio.sleep(4)
-            except Exception as exc:  # noqa: BLE001
-                logger.warning("Error en keep_typing_action: %s", exc)
+            # Returns as soon as the agent answers instead of finishing the wait.
+            if await _wait_for_stop(stop_event, delay):
                 return
 
     animate_task = asyncio.create_task(animate_status_message())
-    typing_task = asyncio.create_task(send_typing_action())
 
     # Use Telegram tools with database logging (always enabled now)
     agent_stream = invoke_agent(
-        update.message.text,
+        message_text,
         telegram_id=telegram_id,
         use_telegram_tools=True,
     )
 
+    async def first_agent_response() -> str:
+        async with _chat_typing.active(chat_id, context.bot):
+            return await agent_stream.__anext__()
+
+    first_response: str | None = None
     try:
-        first_response = await agent_stream.__anext__()
+        first_response = await first_agent_response()
     except StopAsyncIteration:
-        stop_event.set()
-        animate_task.cancel()
-        typing_task.cancel()
-        await asyncio.gather(animate_task, typing_task, return_exceptions=True)
-        await agent_stream.aclose()
-        await status_message.edit_text(
-            "Lo siento, ocurrió un error al consultar al agente. Inténtalo de nuevo más tarde."
-        )
         logger.error("Agent stream completed without responses")
-        return
     except Exception:
-        stop_event.set()
-        animate_task.cancel()
-        typing_task.cancel()
-        await asyncio.gather(animate_task, typing_task, return_exceptions=True)
         logger.exception("Agent invocation failed before first response")
-        await status_message.edit_text(
-            "Lo siento, ocurrió un error al consultar al agente. Inténtalo de nuevo más tarde."
-        )
+    finally:
+        # The animation has exited once this returns, so no edit can race the ones below.
+        await _stop_background(stop_event, animate_task)
+
+    if first_response is None:
+        _log_user_message(telegram_id, message_text)
         await agent_stream.aclose()
+        await status_message.edit_text(_AGENT_ERROR_TEXT)
         return
 
-    stop_event.set()
-    animate_task.cancel()
-    typing_task.cancel()
-    await asyncio.gather(animate_task, typing_task, return_exceptions=True)
-    
-    # Small delay to ensure animation task has fully stopped before editing
-    await asyncio.sleep(0.2)
-
-    # Guardamos la primera respuesta del asistente
+    # Guardamos el mensaje del usuario y la primera respuesta del asistente
     try:
-        await asyncio.to_thread(
-            log_interaction_by_telegram_id,
+        log_interactions_by_telegram_id(
             telegram_id,
-            first_response,
-            role="assistant",
+            [(message_text, "user"), (first_response, "assistant")],
         )
     except Exception:  # noqa: BLE001
-        logger.exception("Failed to log assistant first response")
+        logger.exception("Failed to log user message and assistant first response")
 
+    first_chunk, *other_chunks = _chunk_for_telegram(first_response)
     try:
-        await status_message.edit_text(first_response)
+        await status_message.edit_text(first_chunk)
     except BadRequest as exc:
         # If edit fails (e.g., message was deleted or already modified), send new message
         error_str = str(exc).lower()
         if "message is not modified" in error_str or "bad request" in error_str:
             logger.debug("Could not edit status message, sending new message instead")
-            await update.message.reply_text(first_response)
+            await update.message.reply_text(first_chunk)
         else:
             raise
+    for chunk in other_chunks:
+        await context.bot.send_message(chat_id=chat_id, text=chunk)
+
+    # Las respuestas adicionales se agrupan: se envía como mucho un mensaje por
+    # segundo (o antes, si el texto acumulado ya es largo) y todas se registran
+    # juntas al final del turno.
+    loop = asyncio.get_running_loop()
+    follow_ups: list[tuple[str, str]] = []
+    buffered: list[str] = []
+    last_sent_at = loop.time()
+
+    async def flush_follow_ups() -> None:
+        nonlocal last_sent_at
+        # Chunks carry their own separators: a new message starts with a blank line
+        # and a continuation of the previous one with its word-boundary whitespace.
+        text = "".join(buffered).strip()
+        buffered.clear()
+        if not text:
+            return
+        try:
+            for chunk in _chunk_for_telegram(text):
+                await context.bot.send_message(chat_id=chat_id, text=chunk)
+            follow_ups.append((text, "assistant"))
+        except Exception:
+            logger.warning(
+                "Failed to send follow-up agent response",
+                exc_info=True,
+            )
+        last_sent_at = loop.time()
 
+    pending: asyncio.Future[str] | None = None
     try:
-        async for response_text in agent_stream:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(agent_stream.__anext__())
+            # Buffered text waits for the next response only until its send is due.
+            timeout = (
+                max(0.0, last_sent_at + _FOLLOW_UP_INTERVAL_SECONDS - loop.time())
+                if buffered
+                else None
+            )
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                await flush_follow_ups()
+                continue
+            next_item, pending = pending, None
             try:
-                await context.bot.send_message(chat_id=chat_id, text=response_text)
-                # Guardamos cada respuesta adicional del asistente
-                try:
-                    await asyncio.to_thread(
-                        log_interaction_by_telegram_id,
-                        telegram_id,
-                        response_text,
-                        role="assistant",
-                    )
-                except Exception:  # noqa: BLE001
-                    logger.exception("Failed to log assistant follow-up response")
-            except Exception:
-                logger.warning(
-                    "Failed to send follow-up agent response",
-                    exc_info=True,
-                )
+                buffered.append(next_item.result())
+            except StopAsyncIteration:
+                break
+            if (
+                loop.time() - last_sent_at >= _FOLLOW_UP_INTERVAL_SECONDS
+                or sum(map(len, buffered)) > _FOLLOW_UP_MAX_BUFFERED_CHARS
+            ):
+                await flush_follow_ups()
+        if buffered:
+            await flush_follow_ups()
     except Exception:
         logger.exception("Agent invocation failed while streaming responses")
-        await context.bot.send_message(
-            chat_id=chat_id,
-            text=(
-                "Lo siento, ocurrió un error al consultar al agente. "
-                "Inténtalo de nuevo más tarde."
-            ),
-        )
+        if buffered:
+            await flush_follow_ups()
+        await context.bot.send_message(chat_id=chat_id, text=_AGENT_ERROR_TEXT)
     finally:
-        stop_event.set()
-        await agent_stream.aclose()
\ No newline at end of file
+        if pending is not None:
+            # The stream cannot be closed while this read is still running.
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+        await agent_stream.aclose()
+        if follow_ups:
+            try:
+                log_interactions_by_telegram_id(telegram_id, follow_ups)
+            except Exception:  # noqa: BLE001
+                logger.exception("Failed to log assistant follow-up responses")
\ No newline at end of file